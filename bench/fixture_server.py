@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Local Google-Maps-like fixture server for offline benchmarks.
+
+Serves /maps/search/... pages whose result feed has the same
+div[role="feed"] > div > div > a[href*="/maps/place/"] structure the
+scraper reads. Synthetic pages render an initial batch of cards and append
+more whenever the feed is scrolled, until the configured total is reached
+and an end-of-list marker is shown. With --recorded, saved HTML snapshots
+are served instead, cycling through the files in the directory.
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>{title} - Google Maps</title>
+<style>div[role=feed]{{height:600px;overflow-y:auto}} .card{{height:120px}}</style></head>
+<body>
+<div role="feed" aria-label="Results for {title}">{cards}</div>
+<script>
+const remaining = {remaining};
+const batch = {batch};
+const delay = {delay};
+const feed = document.querySelector('div[role="feed"]');
+let loading = false;
+feed.addEventListener('scroll', () => {{
+    if (loading || feed.scrollTop + feed.clientHeight < feed.scrollHeight - 10) return;
+    if (!remaining.length) {{
+        if (!document.querySelector('.end-of-list')) {{
+            const end = document.createElement('span');
+            end.className = 'end-of-list';
+            end.textContent = "You've reached the end of the list.";
+            feed.appendChild(end);
+        }}
+        return;
+    }}
+    loading = true;
+    setTimeout(() => {{
+        for (const card of remaining.splice(0, batch)) feed.insertAdjacentHTML('beforeend', card);
+        loading = false;
+    }}, delay);
+}});
+</script>
+</body></html>
+"""
+
+CARD = """<div><div class="card"><a href="https://www.google.com/maps/place/{slug}/data=!4m7!3m6!1s0x{fid}:0x{fid}!8m2!3d{lat:.6f}!4d{lng:.6f}!16s%2Fg%2F{fid}!19sChIJfixture{fid}?authuser=0" aria-label="{name}"></a>
+<div>{name}</div><div>{rating}</div><div>({reviews:,})</div><div>Cafe · $$ · {number} King Fahd Rd, {city}</div><div>Open · Closes 11 PM</div></div></div>"""
+
+
+def synthetic_cards(term, total, center=(24.7136, 46.6753)):
+    """Deterministic fake places for a search term."""
+    seed = int(hashlib.sha1(term.encode("utf-8")).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    city = term.split(" in ")[-1].title() if " in " in term else "Riyadh"
+    cards = []
+    for i in range(total):
+        name = f"{term.split(' in ')[0].title()} Spot {i + 1}"
+        cards.append(CARD.format(
+            slug=name.replace(" ", "+"),
+            fid=f"{seed:08x}{i:04x}",
+            lat=center[0] + rng.uniform(-0.08, 0.08),
+            lng=center[1] + rng.uniform(-0.08, 0.08),
+            name=html.escape(name),
+            rating=f"{rng.uniform(3.0, 5.0):.1f}",
+            reviews=rng.randint(3, 5000),
+            number=rng.randint(1, 9999),
+            city=html.escape(city),
+        ))
+    return cards
+
+
+def make_handler(places, batch, delay_ms, recorded=None):
+    snapshots = sorted(
+        os.path.join(recorded, f) for f in os.listdir(recorded) if f.endswith(".html")
+    ) if recorded else []
+    counter = {"served": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if not self.path.startswith("/maps/search/"):
+                self.send_error(404)
+                return
+
+            if snapshots:
+                with lock:
+                    path = snapshots[counter["served"] % len(snapshots)]
+                    counter["served"] += 1
+                with open(path, "rb") as f:
+                    body = f.read()
+            else:
+                term = unquote(self.path[len("/maps/search/"):].split("/@")[0].split("?")[0]).replace("+", " ")
+                cards = synthetic_cards(term, places)
+                first = min(batch, len(cards))
+                body = PAGE.format(
+                    title=html.escape(term),
+                    cards="".join(cards[:first]),
+                    remaining=json.dumps(cards[first:]).replace("</", "<\\/"),
+                    batch=batch,
+                    delay=delay_ms,
+                ).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(port=0, places=60, batch=10, delay_ms=150, recorded=None):
+    """Start the fixture server on a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(places, batch, delay_ms, recorded))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--places", type=int, default=60, help="Places per synthetic search")
+    parser.add_argument("--batch", type=int, default=10, help="Cards rendered per scroll")
+    parser.add_argument("--delay", type=int, default=150, help="Milliseconds before scrolled cards appear")
+    parser.add_argument("--recorded", type=str, default=None, help="Directory of saved feed HTML to serve instead")
+    args = parser.parse_args()
+
+    server, base_url = serve(args.port, args.places, args.batch, args.delay, args.recorded)
+    print(f"Fixture server on {base_url} (set SCRAPER_MAPS_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
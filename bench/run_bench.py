@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Offline scraper benchmarks against the local fixture server.
+
+Measures cold vs warm scrape latency, scrapes per second and browser memory
+per concurrent scrape at several concurrency levels, and an end-to-end load
+test against /api/scrape on a local uvicorn. Results are printed as JSON
+(and written to --out) so runs can be compared across commits with
+--compare.
+
+    python bench/run_bench.py --out bench.json
+    python bench/run_bench.py --compare bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests  # noqa: E402
+
+import scraper  # noqa: E402
+from bench import fixture_server  # noqa: E402
+import lifecycle  # noqa: E402
+from engine import ScrapingEngine  # noqa: E402
+
+LAT, LNG = 24.7136, 46.6753
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return round(values[index], 1)
+
+
+def summarize(latencies_ms):
+    return {
+        "n": len(latencies_ms),
+        "p50Ms": percentile(latencies_ms, 50),
+        "p95Ms": percentile(latencies_ms, 95),
+        "maxMs": round(max(latencies_ms), 1) if latencies_ms else None,
+    }
+
+
+async def scrape_once(engine, base_url, i, max_results):
+    started = time.perf_counter()
+    async with engine.lease(LAT, LNG) as context:
+        places = await scraper.scrape_google_maps(
+            context, f"cafe {i}", "Riyadh", LAT, LNG, max_results, base_url=base_url
+        )
+    return (time.perf_counter() - started) * 1000, len(places)
+
+
+async def bench_cold(base_url, max_results):
+    """Engine start plus the first scrape, as a fresh pod would see it."""
+    started = time.perf_counter()
+    engine = ScrapingEngine(browsers=1, contexts_per_browser=1)
+    await engine.start()
+    try:
+        _, count = await scrape_once(engine, base_url, 0, max_results)
+    finally:
+        await engine.stop()
+    return {"latencyMs": round((time.perf_counter() - started) * 1000, 1), "results": count}
+
+
+async def bench_warm(base_url, runs, max_results):
+    engine = ScrapingEngine(browsers=1, contexts_per_browser=1)
+    await engine.start()
+    await engine.warm_up()
+    try:
+        latencies = [(await scrape_once(engine, base_url, i, max_results))[0] for i in range(runs)]
+    finally:
+        await engine.stop()
+    return summarize(latencies)
+
+
+async def bench_concurrency(base_url, level, runs, max_results):
+    engine = ScrapingEngine(browsers=1, contexts_per_browser=level)
+    await engine.start()
+    await engine.warm_up()
+    # PSS, as the engine's memory limits use: RSS counts Chromium's shared pages once per process
+    idle_pss = lifecycle.children_pss_mb()
+    peak_pss = idle_pss
+    stop = asyncio.Event()
+
+    async def sample_pss():
+        nonlocal peak_pss
+        while not stop.is_set():
+            peak_pss = max(peak_pss, lifecycle.children_pss_mb())
+            await asyncio.sleep(0.2)
+
+    sampler = asyncio.create_task(sample_pss())
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(scrape_once(engine, base_url, i, max_results) for i in range(runs)))
+    finally:
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await sampler
+        await engine.stop()
+
+    return {
+        "concurrency": level,
+        "scrapesPerSecond": round(runs / elapsed, 2),
+        "latency": summarize([latency for latency, _ in results]),
+        "idlePssMb": round(idle_pss, 1),
+        "peakPssMb": round(peak_pss, 1),
+        "pssPerConcurrentScrapeMb": round((peak_pss - idle_pss) / level, 1),
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_e2e(base_url, concurrency, total, timeout=120):
+    """Load-test /api/scrape on a local uvicorn wired to the fixture server."""
+    port = _free_port()
+    api = f"http://127.0.0.1:{port}"
+    store_dir = tempfile.mkdtemp()
+    # Every call comes from 127.0.0.1, so the per-client queue limit must
+    # admit the whole load, and the fixture server needs no navigation pacing
+    env = dict(
+        os.environ,
+        SCRAPER_MAPS_BASE_URL=base_url,
+        PLACE_STORE_PATH=os.path.join(store_dir, "places.db"),
+        SCRAPE_MAX_PER_CLIENT=str(concurrency),
+        SCRAPE_MAX_QUEUE=str(max(concurrency, 20)),
+        NAV_RATE="1000",
+        NAV_MAX_RATE="1000",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(f"{api}/ready", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.25)
+        else:
+            return {"error": "API never became ready"}
+
+        def call(i):
+            # Distinct cities defeat the result cache so every call scrapes
+            started = time.perf_counter()
+            r = requests.post(
+                f"{api}/api/scrape",
+                json={"city": f"Bench City {i}", "category": "cafe", "userLat": LAT, "userLng": LNG},
+                timeout=timeout,
+            )
+            return (time.perf_counter() - started) * 1000, r.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(call, range(total)))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = [latency for latency, status in results if status == 200]
+    rejected = sum(1 for _, status in results if status in (429, 503))
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        # Only answered scrapes count; fast rejections would inflate throughput
+        "requestsPerSecond": round(len(ok) / elapsed, 2),
+        "rejectionRate": round(rejected / total, 3) if total else 0.0,
+        "statuses": statuses,
+        "latency": summarize(ok),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous):
+    """Print the headline numbers of two runs side by side."""
+    def rows(result):
+        yield "cold.latencyMs", result["cold"]["latencyMs"]
+        yield "warm.p50Ms", result["warm"]["p50Ms"]
+        yield "warm.p95Ms", result["warm"]["p95Ms"]
+        for level in result["concurrency"]:
+            c = level["concurrency"]
+            yield f"c{c}.scrapesPerSecond", level["scrapesPerSecond"]
+            # Runs from before the switch to PSS only have rssPerConcurrentScrapeMb
+            yield f"c{c}.pssPerConcurrentScrapeMb", level.get("pssPerConcurrentScrapeMb")
+        if result.get("e2e") and "latency" in result["e2e"]:
+            yield "e2e.requestsPerSecond", result["e2e"]["requestsPerSecond"]
+            yield "e2e.rejectionRate", result["e2e"].get("rejectionRate")
+            yield "e2e.p95Ms", result["e2e"]["latency"]["p95Ms"]
+
+    before = dict(rows(previous))
+    print(f"{'metric':32} {previous.get('commit') or '-':>10} {current.get('commit') or '-':>10}")
+    for name, value in rows(current):
+        print(f"{name:32} {str(before.get(name, '-')):>10} {str(value):>10}")
+
+
+async def run(args, base_url):
+    result = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": vars(args),
+        "cold": await bench_cold(base_url, args.max),
+        "warm": await bench_warm(base_url, args.runs, args.max),
+        "concurrency": [],
+    }
+    for level in args.levels:
+        result["concurrency"].append(await bench_concurrency(base_url, level, max(args.runs, level * 2), args.max))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10, help="Scrapes per warm/concurrency measurement")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--max", type=int, default=5, help="max_results per scrape")
+    parser.add_argument("--places", type=int, default=60, help="Places per fixture search")
+    parser.add_argument("--recorded", type=str, default=None, help="Serve saved feed HTML instead of synthetic pages")
+    parser.add_argument("--e2e-requests", type=int, default=40, help="0 skips the /api/scrape load test")
+    parser.add_argument("--e2e-concurrency", type=int, default=8)
+    parser.add_argument("--out", type=str, default=None, help="Write results JSON here")
+    parser.add_argument("--compare", type=str, default=None, help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    server, base_url = fixture_server.serve(places=args.places, recorded=args.recorded)
+    try:
+        result = asyncio.run(run(args, base_url))
+        if args.e2e_requests:
+            result["e2e"] = bench_e2e(base_url, args.e2e_concurrency, args.e2e_requests)
+    finally:
+        server.shutdown()
+
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
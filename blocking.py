@@ -0,0 +1,108 @@
+"""
+Request-interception profiles for the scraping browser.
+
+The scraper only reads the result feed's DOM, so map tiles, images, fonts,
+media and analytics beacons are pure overhead. A profile decides which of
+those requests get aborted; NetworkStats counts what was blocked and how
+many bytes the remaining requests transferred.
+"""
+
+import os
+from urllib.parse import urlparse
+
+TILE_PATTERNS = ("/maps/vt", "/kh?", "/kh/", "/maps/api/js/StaticMapService", "streetviewpixels", "/maps/preview/pwa")
+ANALYTICS_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "play.google.com",
+)
+ANALYTICS_PATHS = ("/gen_204", "/log?", "/csi?", "/maps/preview/log204")
+
+PROFILES = {
+    "off": {"resource_types": set(), "tiles": False, "analytics": False},
+    "default": {"resource_types": {"image", "media", "font"}, "tiles": True, "analytics": True},
+    "aggressive": {"resource_types": {"image", "media", "font", "stylesheet", "manifest", "other"}, "tiles": True, "analytics": True},
+}
+
+# Running totals across every scrape since the process started
+TOTALS = {"requests": 0, "blocked": 0, "bytes": 0}
+
+
+def profile_from_env():
+    name = os.environ.get("SCRAPER_BLOCK_PROFILE", "default")
+    return name if name in PROFILES else "default"
+
+
+class NetworkStats:
+    """Per-scrape request, block and byte counters."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.requests = 0
+        self.blocked = 0
+        self.bytes = 0
+        self.blocked_by_type = {}
+
+    def as_dict(self):
+        return {
+            "profile": self.profile,
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "bytes": self.bytes,
+            "blockedByType": dict(self.blocked_by_type),
+        }
+
+
+def should_block(profile, resource_type, url):
+    """Return the reason a request is blocked under profile, or None."""
+    rules = PROFILES[profile]
+    if resource_type in rules["resource_types"]:
+        return resource_type
+    parsed = urlparse(url)
+    if rules["tiles"] and any(p in url for p in TILE_PATTERNS):
+        return "tile"
+    if rules["analytics"] and (
+        any(parsed.hostname and parsed.hostname.endswith(h) for h in ANALYTICS_HOSTS)
+        or any(p in parsed.path + ("?" if parsed.query else "") for p in ANALYTICS_PATHS)
+    ):
+        return "analytics"
+    return None
+
+
+async def install(target, profile=None):
+    """Route requests of a Page or BrowserContext through a block profile."""
+    profile = profile or profile_from_env()
+    stats = NetworkStats(profile)
+
+    def started(request):
+        stats.requests += 1
+        TOTALS["requests"] += 1
+
+    async def handle(route):
+        request = route.request
+        reason = should_block(profile, request.resource_type, request.url)
+        if reason:
+            stats.blocked += 1
+            TOTALS["blocked"] += 1
+            stats.blocked_by_type[reason] = stats.blocked_by_type.get(reason, 0) + 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def finished(request):
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        size = sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+        stats.bytes += size
+        TOTALS["bytes"] += size
+
+    if profile != "off":
+        await target.route("**/*", handle)
+    target.on("request", started)
+    target.on("requestfinished", finished)
+    return stats
@@ -0,0 +1,186 @@
+"""
+Upstream protection: a circuit breaker and an adaptive navigation limiter.
+
+The breaker watches the outcome of recent live scrapes. When too many of
+them end in an upstream block (consent wall, captcha, failed navigation,
+see scraper.UPSTREAM_BLOCKS), it opens and live scrapes fail fast
+for a cooldown that doubles each time a probe scrape fails again. After the
+cooldown one probe is let through; if it succeeds the breaker closes.
+
+The limiter paces outbound Maps navigations with a token bucket whose rate
+grows slowly while scrapes succeed and halves on every upstream block
+(additive increase, multiplicative decrease), so we back off before Google
+escalates from consent walls to blocks.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamDegraded(Exception):
+    """Raised instead of scraping while upstream is failing or throttled."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Failure-ratio breaker over the last `window` live scrapes."""
+
+    def __init__(self, window=20, min_calls=5, failure_ratio=0.5, cooldown=30.0, max_cooldown=600.0, probe_timeout=60.0):
+        self.window = max(1, window)
+        self.min_calls = max(1, min_calls)
+        self.failure_ratio = failure_ratio
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_timeout = probe_timeout
+
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=self.window)
+        self._cooldown = cooldown
+        self._opened_until = 0.0
+        self._probe_started = None
+        self.opened = 0
+        self.rejected = 0
+        self.failures = {}
+
+    @classmethod
+    def from_env(cls, probe_timeout=60.0):
+        return cls(
+            window=int(os.environ.get("BREAKER_WINDOW", 20)),
+            min_calls=int(os.environ.get("BREAKER_MIN_CALLS", 5)),
+            failure_ratio=float(os.environ.get("BREAKER_FAILURE_RATIO", 0.5)),
+            cooldown=float(os.environ.get("BREAKER_COOLDOWN", 30)),
+            max_cooldown=float(os.environ.get("BREAKER_MAX_COOLDOWN", 600)),
+            probe_timeout=probe_timeout,
+        )
+
+    def retry_after(self):
+        return max(1, int(self._opened_until - time.monotonic()))
+
+    def allow(self):
+        """True if a live scrape may run now; in half-open, only one probe at a time."""
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now < self._opened_until:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probe_started = None
+        # A probe that never reported back (rejected by the queue, cancelled)
+        # must not wedge the breaker half-open forever
+        if self._probe_started is not None and now - self._probe_started < self.probe_timeout:
+            self.rejected += 1
+            return False
+        self._probe_started = now
+        return True
+
+    def record(self, failure=None):
+        """Report one live scrape's outcome: None for success, else its failure kind."""
+        if failure is not None:
+            self.failures[failure] = self.failures.get(failure, 0) + 1
+        if self.state == HALF_OPEN:
+            if failure is None:
+                self.state = CLOSED
+                self._cooldown = self.base_cooldown
+                self._outcomes.clear()
+            else:
+                self._open(min(self._cooldown * 2, self.max_cooldown))
+            return
+        if self.state == OPEN:
+            return
+
+        self._outcomes.append(failure is not None)
+        failed = sum(self._outcomes)
+        if len(self._outcomes) >= self.min_calls and failed / len(self._outcomes) >= self.failure_ratio:
+            self._open(self._cooldown)
+
+    def _open(self, cooldown):
+        self.state = OPEN
+        self._cooldown = cooldown
+        self._opened_until = time.monotonic() + cooldown
+        self._probe_started = None
+        self._outcomes.clear()
+        self.opened += 1
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "retryAfter": self.retry_after() if self.state == OPEN else 0,
+            "cooldown": self._cooldown,
+            "recentFailures": sum(self._outcomes),
+            "recentCalls": len(self._outcomes),
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "failures": dict(self.failures),
+        }
+
+
+class AdaptiveRateLimiter:
+    """Token bucket for navigations with an AIMD-adjusted refill rate."""
+
+    def __init__(self, rate=2.0, min_rate=0.2, max_rate=5.0, increase=0.1, decrease=0.5, burst=None):
+        self.min_rate = min_rate
+        self.max_rate = max(min_rate, max_rate)
+        self.rate = min(max(rate, min_rate), self.max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst or max(1.0, self.rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self.throttled = 0
+        self.waited = 0.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            rate=float(os.environ.get("NAV_RATE", 2)),
+            min_rate=float(os.environ.get("NAV_MIN_RATE", 0.2)),
+            max_rate=float(os.environ.get("NAV_MAX_RATE", 5)),
+        )
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, max_wait):
+        """Wait for a navigation slot; False (without consuming one) if it would take over max_wait seconds."""
+        self._refill()
+        # Tokens may go negative: each caller reserves its slot, then sleeps off its debt
+        wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+        if wait > max_wait:
+            self.throttled += 1
+            return False
+        self._tokens -= 1
+        if wait > 0:
+            self.waited += wait
+            await asyncio.sleep(wait)
+        return True
+
+    def feedback(self, failure=None):
+        if failure is None:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+        else:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+
+    def retry_after(self):
+        return max(1, int(1 / self.rate))
+
+    def stats(self):
+        self._refill()
+        return {
+            "rate": round(self.rate, 3),
+            "tokens": round(self._tokens, 2),
+            "throttled": self.throttled,
+            "waitedSeconds": round(self.waited, 1),
+        }
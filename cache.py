@@ -0,0 +1,88 @@
+"""
+TTL + LRU cache for scrape results.
+
+Entries are fresh for `ttl` seconds, then servable-but-stale for another
+`stale_ttl` seconds so the caller can answer immediately and refresh in the
+background. Past that they count as misses. The least recently used entry
+is evicted once `max_entries` is reached.
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+FRESH = "fresh"
+STALE = "stale"
+
+
+class ResultCache:
+    """Bounded LRU mapping with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, max_entries=256, ttl=900, stale_ttl=1800):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 256)),
+            ttl=float(os.environ.get("CACHE_TTL", 900)),
+            stale_ttl=float(os.environ.get("CACHE_STALE_TTL", 1800)),
+        )
+
+    def get(self, key):
+        """Return (value, FRESH|STALE), or (None, None) on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, None
+
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl + self.stale_ttl:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None, None
+
+        self._entries.move_to_end(key)
+        if age > self.ttl:
+            self.stale_hits += 1
+            return value, STALE
+        self.hits += 1
+        return value, FRESH
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def age(self, key):
+        """Seconds since key was stored, or None; does not count as a lookup."""
+        entry = self._entries.get(key)
+        return None if entry is None else time.monotonic() - entry[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hitRatio": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,214 @@
+"""
+Query canonicalization.
+
+Requests arrive as free text in Arabic or English, in any case and
+spelling ("Coffee", "كافيهات", "café"). canonicalize() folds Unicode and
+Arabic letter variants and maps a city, category or mood onto a canonical
+id when the whole text is a known variant; anything else ("Hot Pot",
+"Best Buy") is searched as typed. Sort-intent words ("closest", "الأفضل")
+are only taken from the mood modifier, where they become a sort mode
+instead of search text. The canonical form is what the cache,
+single-flight and place store key on, so equivalent searches share one
+scrape. CollapseStats measures how many raw request forms that saves.
+"""
+
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+# city/category/mood are canonical ids (or normalized text when unknown),
+# sort is a ranking mode or None, query and city_query are what to search
+Query = namedtuple("Query", "city category mood sort query city_query")
+
+# Harakat, superscript alef and Quranic marks
+ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed]")
+ARABIC_LETTERS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+    "ـ": "",  # tatweel
+    "٠": "0", "١": "1", "٢": "2", "٣": "3", "٤": "4",
+    "٥": "5", "٦": "6", "٧": "7", "٨": "8", "٩": "9",
+    "،": " ", "؛": " ", "؟": " ",
+})
+NON_WORD = re.compile(r"[^\w\s]+")
+
+# canonical id -> (search text, variants); variants are matched after normalize()
+CITIES = {
+    "riyadh": ("Riyadh", ["riyadh", "riyad", "الرياض", "رياض"]),
+    "jeddah": ("Jeddah", ["jeddah", "jedda", "jiddah", "جده", "جدة"]),
+    "makkah": ("Makkah", ["makkah", "mecca", "makka", "مكه", "مكة", "مكه المكرمه"]),
+    "madinah": ("Madinah", ["madinah", "medina", "madina", "المدينه", "المدينه المنوره"]),
+    "dammam": ("Dammam", ["dammam", "الدمام", "دمام"]),
+    "khobar": ("Khobar", ["khobar", "al khobar", "alkhobar", "الخبر", "خبر"]),
+    "abha": ("Abha", ["abha", "ابها"]),
+    "taif": ("Taif", ["taif", "al taif", "الطايف", "الطائف", "طايف"]),
+    "tabuk": ("Tabuk", ["tabuk", "tabouk", "تبوك"]),
+    "buraidah": ("Buraidah", ["buraidah", "buraydah", "بريده", "بريدة"]),
+}
+
+CATEGORIES = {
+    "cafe": ("cafe", ["cafe", "cafes", "coffee", "coffee shop", "coffee shops", "coffeeshop",
+                      "كافيه", "كافيهات", "كافي", "كوفي", "قهوه", "مقهي", "مقاهي"]),
+    "restaurant": ("restaurant", ["restaurant", "restaurants", "food", "dinner", "lunch",
+                                  "مطعم", "مطاعم", "اكل", "عشاء", "عشا", "غداء", "غدا"]),
+    "breakfast": ("breakfast", ["breakfast", "brunch", "فطور", "ريوق", "افطار"]),
+    "dessert": ("dessert", ["dessert", "desserts", "sweets", "حلا", "حلويات", "حلى"]),
+    "bakery": ("bakery", ["bakery", "bakeries", "مخبز", "مخابز"]),
+    "burger": ("burger", ["burger", "burgers", "برجر", "برقر"]),
+    "pizza": ("pizza", ["pizza", "بيتزا"]),
+    "juice": ("juice bar", ["juice", "juices", "juice bar", "عصير", "عصيرات"]),
+    "park": ("park", ["park", "parks", "garden", "gardens", "حديقه", "حدائق", "منتزه", "منتزهات"]),
+    "mall": ("mall", ["mall", "malls", "shopping mall", "shopping", "مول", "مولات", "مجمع تجاري"]),
+    "cinema": ("cinema", ["cinema", "cinemas", "movies", "movie theater", "سينما", "سينمات"]),
+    "beach": ("beach", ["beach", "beaches", "شاطي", "شواطي", "بحر"]),
+}
+
+MOODS = {
+    "quiet": ("quiet", ["quiet", "calm", "chill", "chill vibes", "relaxed", "هادي", "هاديه", "رايق", "جو هادي"]),
+    "late_night": ("late night", ["late night", "night out", "سهره", "سهر", "اخر الليل"]),
+    "family": ("family", ["family", "family friendly", "kids", "عائلي", "عوائل", "اطفال"]),
+    "romantic": ("romantic", ["romantic", "رومانسي"]),
+    "cheap": ("cheap", ["cheap", "budget", "affordable", "رخيص", "اقتصادي"]),
+    "spicy": ("spicy", ["spicy", "spicy food", "حار", "سبايسي", "اكل سبايسي"]),
+    "outdoor": ("outdoor", ["outdoor", "outdoors", "outside", "terrace", "جلسات خارجيه", "خارجي"]),
+}
+
+# Mood words that say how to order results rather than what to search for
+SORT_INTENTS = {
+    "distance": ["closest", "nearest", "near me", "nearby", "الاقرب", "اقرب", "قريب", "قريبه"],
+    "bayesian": ["top rated", "best rated", "highest rated", "best",
+                 "الافضل", "افضل", "اعلي تقييم", "الاعلي تقييم", "احسن"],
+    "composite": ["popular trending", "popular", "trending", "famous", "hot spots",
+                  "مشهور", "مشهوره", "ترند", "الترند", "المشهوره"],
+}
+
+# Dropped from city text: "Riyadh, Saudi Arabia" is just Riyadh
+COUNTRY_WORDS = ["saudi arabia", "ksa", "sa", "السعوديه", "المملكه العربيه السعوديه"]
+
+
+def normalize(text):
+    """Case, width, whitespace and Arabic letter-variant folding."""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = ARABIC_MARKS.sub("", text).translate(ARABIC_LETTERS)
+    # Accents go (café -> cafe); Arabic letters are not decomposable and survive
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    text = NON_WORD.sub(" ", text)
+    return " ".join(text.split())
+
+
+def _index(table):
+    # Normalized variant -> canonical id
+    index = {}
+    for canonical_id, (_, variants) in table.items():
+        # Ids map onto themselves, so canonical forms canonicalize unchanged
+        for variant in variants + [canonical_id, canonical_id.replace("_", " ")]:
+            index[normalize(variant)] = canonical_id
+    return index
+
+
+CITY_INDEX = _index(CITIES)
+CATEGORY_INDEX = _index(CATEGORIES)
+MOOD_INDEX = _index(MOODS)
+SORT_INDEX = {normalize(word): mode for mode, words in SORT_INTENTS.items() for word in words}
+COUNTRY_RE = re.compile(" (?:" + "|".join(re.escape(normalize(word)) for word in COUNTRY_WORDS) + ")(?= )")
+
+
+def _strip_article(token):
+    # "القهوه" and "قهوه" are the same word
+    return token[2:] if token.startswith("ال") and len(token) > 3 else token
+
+
+def _match(tokens, start, index):
+    """Longest phrase in index starting at tokens[start]: (canonical id, length) or (None, 0)."""
+    for length in range(min(4, len(tokens) - start), 0, -1):
+        phrase = " ".join(tokens[start:start + length])
+        for candidate in (phrase, " ".join(_strip_article(t) for t in tokens[start:start + length])):
+            if candidate in index:
+                return index[candidate], length
+    return None, 0
+
+
+def _whole(tokens, index):
+    """Canonical id when all of tokens is one known variant, else None."""
+    canonical_id, length = _match(tokens, 0, index)
+    return canonical_id if tokens and length == len(tokens) else None
+
+
+def _canonical_city(city):
+    text = COUNTRY_RE.sub(" ", " " + normalize(city) + " ")
+    # A bare "KSA" is still a place to search
+    tokens = text.split() or normalize(city).split()
+    canonical_id = _whole(tokens, CITY_INDEX)
+    if canonical_id:
+        return canonical_id, CITIES[canonical_id][0]
+    text = " ".join(tokens)
+    return text, text
+
+
+def _canonical_category(category):
+    """(id, search text): a known category, or the user's own words unchanged."""
+    canonical_id = _whole(normalize(category).split(), CATEGORY_INDEX)
+    if canonical_id:
+        return canonical_id, CATEGORIES[canonical_id][0]
+    return normalize(category), " ".join((category or "").split())
+
+
+def _canonical_mood(mood):
+    """(id, search text, sort mode or None) for a mood modifier."""
+    tokens = normalize(mood).split()
+    rest, sort, i = [], None, 0
+    while i < len(tokens):
+        mode, length = _match(tokens, i, SORT_INDEX)
+        if length:
+            sort = sort or mode
+            i += length
+        else:
+            rest.append(tokens[i])
+            i += 1
+    canonical_id = _whole(rest, MOOD_INDEX)
+    if canonical_id:
+        return canonical_id, MOODS[canonical_id][0], sort
+    text = " ".join(rest)
+    return text, text, sort
+
+
+@lru_cache(maxsize=4096)
+def canonicalize(city, category, mood=None):
+    """Canonical Query for one (city, category, mood) as typed by a user."""
+    city_id, city_query = _canonical_city(city)
+    category_id, category_text = _canonical_category(category)
+    mood_id, mood_text, sort = _canonical_mood(mood)
+    query = " ".join(part for part in (mood_text, category_text) if part)
+    return Query(city_id, category_id, mood_id, sort, query, city_query)
+
+
+class CollapseStats:
+    """How many distinct raw request forms map onto each canonical key."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._raw = set()
+        self._canonical = set()
+        self.requests = 0
+
+    def record(self, raw, canonical):
+        self.requests += 1
+        if len(self._raw) >= self.max_keys:
+            # Start a new measurement window rather than grow without bound
+            self._raw.clear()
+            self._canonical.clear()
+        self._raw.add(raw)
+        self._canonical.add(canonical)
+
+    def ratio(self):
+        """Share of raw forms that collapsed onto an already-seen key (0 = no sharing)."""
+        return round(1 - len(self._canonical) / len(self._raw), 3) if self._raw else 0.0
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "rawKeys": len(self._raw),
+            "canonicalKeys": len(self._canonical),
+            "collapseRatio": self.ratio(),
+        }
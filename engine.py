@@ -0,0 +1,436 @@
+"""
+In-process Playwright engine.
+
+Keeps a small pool of pre-launched Chromium browsers, each holding a few
+isolated BrowserContexts, and leases those contexts out to scrape requests.
+Contexts are recycled after a number of uses. Whole browsers are drained and
+relaunched once their process tree grows past a memory threshold or they have
+served a number of pages, and orphaned Chromium processes are reaped (see
+lifecycle.py). How many contexts may be leased at once is also capped by
+the memory actually left on the node.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+from playwright.async_api import async_playwright
+
+import lifecycle
+import metrics
+
+
+class EngineNotReady(RuntimeError):
+    """Raised when a context is requested before the browsers are usable."""
+
+
+# Cheap local page used to warm each browser without touching the network
+WARM_UP_URL = "data:text/html,<title>warm</title><p>ready</p>"
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+class _Slot:
+    """One pooled BrowserContext and the browser that owns it."""
+
+    def __init__(self, browser_index):
+        self.browser_index = browser_index
+        self.context = None
+        self.uses = 0
+
+
+class ScrapingEngine:
+    """Pool of warm Chromium browsers handing out isolated contexts."""
+
+    def __init__(self, browsers=1, contexts_per_browser=2, max_context_uses=25,
+                 max_pss_mb=1500, max_browser_pages=500, check_interval=15.0, memory=None, headless=True):
+        self.browsers_count = max(1, browsers)
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.max_context_uses = max(1, max_context_uses)
+        # Per browser: its whole process tree's PSS, and pages opened over its lifetime
+        self.max_pss_mb = max_pss_mb
+        self.max_browser_pages = max_browser_pages
+        self.check_interval = check_interval
+        self.memory = memory or lifecycle.MemoryGovernor()
+        self.headless = headless
+
+        self._playwright = None
+        self._browsers = []
+        self._pids = []
+        self._pages = []
+        self._launched_at = []
+        self._launch_lock = asyncio.Lock()
+        self._reconnect_locks = {}
+        # Browsers being recycled, and their slots set aside until all are back
+        self._draining = set()
+        self._held = {}
+        self._relaunches = set()
+        self._active = 0
+        self._released = None
+        self._maintainer = None
+        self._idle = None
+        self._slots = []
+        self.recycled = 0
+        self.recycled_browsers = {}
+        self.orphans_reaped = 0
+        self.started = False
+        self.ready = False
+        self.error = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            browsers=int(os.environ.get("SCRAPER_BROWSERS", 1)),
+            contexts_per_browser=int(os.environ.get("SCRAPER_CONTEXTS_PER_BROWSER", 2)),
+            max_context_uses=int(os.environ.get("SCRAPER_CONTEXT_MAX_USES", 25)),
+            # SCRAPER_MAX_RSS_MB is the name older deployments still set
+            max_pss_mb=float(os.environ.get("SCRAPER_MAX_PSS_MB", os.environ.get("SCRAPER_MAX_RSS_MB", 1500))),
+            max_browser_pages=int(os.environ.get("SCRAPER_BROWSER_MAX_PAGES", 500)),
+            check_interval=float(os.environ.get("BROWSER_CHECK_INTERVAL", 15)),
+            memory=lifecycle.MemoryGovernor.from_env(),
+        )
+
+    @property
+    def capacity(self):
+        return self.browsers_count * self.contexts_per_browser
+
+    async def start(self, install_missing=False):
+        if self.started:
+            return
+        self._playwright = await async_playwright().start()
+        executable = self._playwright.chromium.executable_path
+        if not os.path.exists(executable):
+            if not install_missing:
+                await self._playwright.stop()
+                self._playwright = None
+                raise FileNotFoundError(f"Chromium is not installed at {executable}; run 'playwright install chromium'")
+            print("Chromium binary missing, running 'playwright install chromium'...", file=sys.stderr)
+            process = await asyncio.create_subprocess_exec(sys.executable, "-m", "playwright", "install", "chromium")
+            await process.wait()
+
+        # Browsers a crashed or killed earlier instance left running
+        await self.reap_orphans()
+        self._idle = asyncio.Queue()
+        self._released = asyncio.Event()
+        for i in range(self.browsers_count):
+            self._browsers.append(None)
+            self._pids.append(None)
+            self._pages.append(0)
+            self._launched_at.append(time.monotonic())
+            await self._launch_browser(i)
+            for _ in range(self.contexts_per_browser):
+                slot = _Slot(i)
+                slot.context = await self._new_context(slot)
+                self._slots.append(slot)
+                self._idle.put_nowait(slot)
+        self.started = True
+        self._maintainer = asyncio.create_task(self._maintain())
+
+    async def warm_up(self):
+        """Load a local page in every browser so the first real scrape is hot."""
+        for browser in self._browsers:
+            context = await browser.new_context()
+            try:
+                page = await context.new_page()
+                await page.goto(WARM_UP_URL)
+                await page.evaluate("() => document.title")
+            finally:
+                await context.close()
+        self.ready = True
+
+    async def stop(self):
+        if not self.started:
+            return
+        self.started = False
+        self.ready = False
+        if self._maintainer is not None:
+            self._maintainer.cancel()
+            self._maintainer = None
+        for task in list(self._relaunches):
+            task.cancel()
+        for slot in self._slots:
+            await self._close_context(slot)
+        for index in range(len(self._browsers)):
+            await self._close_browser(index)
+        self._browsers = []
+        self._pids = []
+        self._pages = []
+        self._launched_at = []
+        self._draining = set()
+        self._held = {}
+        self._slots = []
+        await self._playwright.stop()
+        self._playwright = None
+
+    async def _launch_browser(self, index):
+        async with self._launch_lock:
+            # The new main process is the flagged one that was not there before
+            me = os.getpid()
+            before = lifecycle.browser_mains(lifecycle.snapshot(), owner=me)
+            started = time.perf_counter()
+            browser = await self._playwright.chromium.launch(
+                headless=self.headless, args=[f"{lifecycle.OWNER_FLAG}{me}"]
+            )
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="browser_launch")
+            launched = lifecycle.browser_mains(lifecycle.snapshot(), owner=me) - before
+            self._browsers[index] = browser
+            self._pids[index] = launched.pop() if len(launched) == 1 else None
+            self._pages[index] = 0
+            self._launched_at[index] = time.monotonic()
+        return browser
+
+    async def _close_browser(self, index):
+        """Close one browser, killing whatever of its process tree survives."""
+        browser, pid = self._browsers[index], self._pids[index]
+        self._pids[index] = None
+        if browser is not None:
+            try:
+                await asyncio.wait_for(browser.close(), timeout=10)
+            except Exception as e:
+                print(f"Browser close failed: {e}", file=sys.stderr)
+        if pid is not None:
+            procs = lifecycle.snapshot()
+            if pid in procs:
+                lifecycle.kill_tree(procs, pid)
+
+    async def _new_context(self, slot):
+        # Slots of one browser share a lock so a crashed browser is relaunched once
+        async with self._reconnect_locks.setdefault(slot.browser_index, asyncio.Lock()):
+            browser = self._browsers[slot.browser_index]
+            if not browser.is_connected():
+                await self._close_browser(slot.browser_index)
+                browser = await self._launch_browser(slot.browser_index)
+                self._count_browser_recycle("disconnected")
+        return await browser.new_context(locale="en-US", user_agent=USER_AGENT)
+
+    async def _close_context(self, slot):
+        if slot.context is None:
+            return
+        try:
+            await slot.context.close()
+        except Exception as e:
+            print(f"Context close failed: {e}", file=sys.stderr)
+        slot.context = None
+
+    async def _recycle(self, slot):
+        await self._close_context(slot)
+        slot.context = await self._new_context(slot)
+        slot.uses = 0
+        self.recycled += 1
+
+    def _needs_recycle(self, slot):
+        if slot.context is None or slot.uses >= self.max_context_uses:
+            return True
+        return not self._browsers[slot.browser_index].is_connected()
+
+    def _browser_mb(self, index):
+        pid = self._pids[index]
+        return self.memory.tree_mb(pid) if pid else 0.0
+
+    def _over_limits(self, index):
+        """Why browser index should be recycled, or None."""
+        if self.max_browser_pages and self._pages[index] >= self.max_browser_pages:
+            return "pages"
+        if self.max_pss_mb and self._browser_mb(index) > self.max_pss_mb:
+            return "pss"
+        return None
+
+    def _count_browser_recycle(self, reason):
+        self.recycled_browsers[reason] = self.recycled_browsers.get(reason, 0) + 1
+        metrics.BROWSER_RECYCLES.inc(reason=reason)
+
+    async def _drain(self, index, reason):
+        """Stop leasing browser index; it is relaunched once all its slots are back."""
+        if index in self._draining:
+            return
+        self._draining.add(index)
+        self._count_browser_recycle(reason)
+        print(f"Recycling browser {index} ({reason})", file=sys.stderr)
+        idle = []
+        while not self._idle.empty():
+            idle.append(self._idle.get_nowait())
+        for slot in idle:
+            if slot.browser_index == index:
+                await self._hold(slot)
+            else:
+                self._idle.put_nowait(slot)
+
+    async def _hold(self, slot):
+        await self._close_context(slot)
+        held = self._held.setdefault(slot.browser_index, [])
+        held.append(slot)
+        if len(held) == self.contexts_per_browser:
+            # Relaunching takes a while; the caller releasing the last slot should not wait for it
+            task = asyncio.create_task(self._relaunch(slot.browser_index))
+            self._relaunches.add(task)
+            task.add_done_callback(self._relaunches.discard)
+
+    async def _relaunch(self, index):
+        slots = self._held.pop(index, [])
+        try:
+            await self._close_browser(index)
+            await self._launch_browser(index)
+            for slot in slots:
+                slot.context = await self._new_context(slot)
+                slot.uses = 0
+        except Exception as e:
+            # Slots without a context are rebuilt on their next acquire
+            print(f"Browser relaunch failed: {e}", file=sys.stderr)
+        finally:
+            self._draining.discard(index)
+            for slot in slots:
+                self._idle.put_nowait(slot)
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                self.memory.sample(fresh=True)
+                for index in range(len(self._browsers)):
+                    reason = self._over_limits(index)
+                    if reason and index not in self._draining:
+                        await self._drain(index, reason)
+                await self.reap_orphans()
+            except Exception as e:
+                print(f"Browser maintenance failed: {e}", file=sys.stderr)
+
+    async def reap_orphans(self):
+        """Kill flagged browsers this engine does not track (ours or a dead owner's)."""
+        async with self._launch_lock:
+            procs = lifecycle.snapshot()
+            tracked = {pid for pid in self._pids if pid is not None}
+            for pid in lifecycle.orphans(procs, tracked):
+                killed = lifecycle.kill_tree(procs, pid)
+                self.orphans_reaped += 1
+                metrics.ORPHANS_REAPED.inc()
+                print(f"Reaped orphaned browser {pid} ({killed} processes)", file=sys.stderr)
+
+    @property
+    def idle(self):
+        return self._idle.qsize() if self._idle else 0
+
+    @property
+    def active(self):
+        """Slots currently leased out, parked pages included."""
+        return self._active
+
+    @property
+    def available(self):
+        """True if acquire() would get a context without waiting."""
+        limit = self.memory.limit(self._active)
+        return self.idle > 0 and (limit is None or self._active < limit)
+
+    async def _wait_for_memory(self):
+        waited = False
+        while self._active:
+            limit = self.memory.limit(self._active)
+            if limit is None or self._active < limit:
+                break
+            if not waited:
+                waited = True
+                self.memory.waits += 1
+                metrics.MEMORY_WAITS.inc()
+            # Re-check when a scrape ends or memory is next sampled
+            self._released.clear()
+            try:
+                await asyncio.wait_for(self._released.wait(), timeout=self.memory.sample_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def acquire(self, user_lat=None, user_lng=None):
+        """Take a slot whose context is configured for the caller's location.
+
+        Waits while the node has no memory for another scrape. The slot must
+        be handed back with release(); lease() does both.
+        """
+        if not self.started:
+            raise EngineNotReady("Scraping engine is not running")
+        await self._wait_for_memory()
+        while True:
+            slot = await self._idle.get()
+            if slot.browser_index not in self._draining:
+                break
+            await self._hold(slot)
+        self._active += 1
+        try:
+            if self._needs_recycle(slot):
+                await self._recycle(slot)
+            context = slot.context
+            await context.clear_cookies()
+            if user_lat is not None and user_lng is not None:
+                await context.set_geolocation({"latitude": user_lat, "longitude": user_lng})
+                await context.grant_permissions(["geolocation"])
+            else:
+                await context.clear_permissions()
+        except BaseException:
+            await self.release(slot)
+            raise
+        return slot
+
+    async def release(self, slot):
+        """Close the slot's pages and return it to the pool."""
+        slot.uses += 1
+        self._active -= 1
+        self._released.set()
+        try:
+            if slot.context is not None:
+                pages = list(slot.context.pages)
+                self._pages[slot.browser_index] += len(pages)
+                for page in pages:
+                    await page.close()
+        except Exception:
+            # A context that cannot close its pages is not safe to reuse
+            await self._close_context(slot)
+        index = slot.browser_index
+        if index not in self._draining:
+            reason = self._over_limits(index)
+            if reason:
+                await self._drain(index, reason)
+        if index in self._draining:
+            await self._hold(slot)
+        else:
+            self._idle.put_nowait(slot)
+
+    @asynccontextmanager
+    async def lease(self, user_lat=None, user_lng=None):
+        """Borrow an isolated context, configured for the caller's location."""
+        slot = await self.acquire(user_lat, user_lng)
+        try:
+            yield slot.context
+        finally:
+            await self.release(slot)
+
+    def browser_stats(self):
+        """Memory and lifetime of each pooled browser, for capacity planning."""
+        procs = self.memory.sample()
+        now = time.monotonic()
+        browsers = []
+        for index, pid in enumerate(self._pids):
+            browsers.append({
+                "index": index,
+                "pid": pid,
+                "pssMb": round(self.memory.tree_mb(pid), 1) if pid else None,
+                "processes": 1 + len(lifecycle.descendants(procs, pid)) if pid in procs else 0,
+                "pages": self._pages[index],
+                "ageSeconds": round(now - self._launched_at[index]),
+                "draining": index in self._draining,
+            })
+        return browsers
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "browsers": len(self._browsers),
+            "contexts": len(self._slots),
+            "idleContexts": self.idle,
+            "activeContexts": self._active,
+            "recycledContexts": self.recycled,
+            "recycledBrowsers": dict(self.recycled_browsers),
+            "orphansReaped": self.orphans_reaped,
+            "browserPssMb": round(self.memory.used_mb(), 1),
+            "perBrowser": self.browser_stats(),
+            "memory": self.memory.stats(self._active),
+        }
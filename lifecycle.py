@@ -0,0 +1,262 @@
+"""
+Browser process tracking and memory governance.
+
+Every Chromium we launch carries an OWNER_FLAG switch naming the API
+process, so its main process can be told apart in /proc from other
+browsers and from ones left behind by an earlier, crashed instance.
+snapshot() reads the process table once; the engine uses it to attribute
+memory to each browser (main process plus renderers, GPU and utility
+children), to find orphans (flagged browsers nobody tracks any more) and
+to decide how many scrapes fit in memory right now.
+
+Chromium's processes share most of their pages, so summing RSS over a tree
+counts them several times; browser memory is measured as PSS from
+smaps_rollup instead. Free memory is the container's cgroup limit minus its
+usage when there is one, since MemAvailable reports the whole host.
+"""
+
+import os
+import signal
+import time
+from collections import namedtuple
+
+# Chromium ignores switches it does not know, but keeps them on its command line
+OWNER_FLAG = "--lets-go-owner="
+
+Proc = namedtuple("Proc", "ppid rss_mb cmdline")
+
+
+def snapshot():
+    """{pid: Proc} for every process we can read, or {} without /proc."""
+    try:
+        pids = [int(p) for p in os.listdir("/proc") if p.isdigit()]
+    except OSError:
+        return {}
+    page_mb = os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    procs = {}
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                stat = f.read()
+            with open(f"/proc/{pid}/statm") as f:
+                pages = int(f.read().split()[1])
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read().decode(errors="replace").split("\0")
+        except (OSError, ValueError, IndexError):
+            continue
+        # The command name may contain spaces, so split after the closing paren
+        fields = stat.rsplit(")", 1)[1].split()
+        procs[pid] = Proc(int(fields[1]), pages * page_mb, cmdline)
+    return procs
+
+
+def descendants(procs, root):
+    children = {}
+    for pid, proc in procs.items():
+        children.setdefault(proc.ppid, []).append(pid)
+    found = []
+    stack = [root]
+    while stack:
+        for pid in children.get(stack.pop(), ()):
+            found.append(pid)
+            stack.append(pid)
+    return found
+
+
+def pss_mb(pid):
+    """Proportional set size (MB) of one process, or None where smaps_rollup is unreadable."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def children_pss_mb(root_pid=None):
+    """PSS (MB) of every descendant of root_pid (default: this process), RSS where PSS is unreadable."""
+    procs = snapshot()
+    total = 0.0
+    for pid in descendants(procs, root_pid or os.getpid()):
+        pss = pss_mb(pid)
+        total += pss if pss is not None else procs[pid].rss_mb
+    return total
+
+
+def owner_of(proc):
+    """Owner pid from a browser main process's command line, else None.
+
+    Renderer and other child processes carry --type= and are not counted.
+    """
+    owner = None
+    for arg in proc.cmdline:
+        if arg.startswith("--type="):
+            return None
+        if arg.startswith(OWNER_FLAG):
+            try:
+                owner = int(arg[len(OWNER_FLAG):])
+            except ValueError:
+                return None
+    return owner
+
+
+def browser_mains(procs, owner=None):
+    """Pids of flagged browser main processes, optionally only those of owner."""
+    return {pid for pid, proc in procs.items() if owner_of(proc) is not None and owner in (None, owner_of(proc))}
+
+
+def orphans(procs, tracked):
+    """Flagged browsers that are not in tracked and whose owner is us or gone."""
+    me = os.getpid()
+    found = []
+    for pid in browser_mains(procs):
+        if pid in tracked:
+            continue
+        owner = owner_of(procs[pid])
+        if owner == me or owner not in procs:
+            found.append(pid)
+    return found
+
+
+def kill_tree(procs, root):
+    """SIGKILL root and its descendants; returns how many were signalled."""
+    killed = 0
+    # Children first, so nothing is reparented to init halfway through
+    for pid in reversed([root] + descendants(procs, root)):
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except (ProcessLookupError, PermissionError):
+            pass
+    return killed
+
+
+# cgroup v2, then v1: (limit, usage) files
+CGROUP_MEMORY_FILES = [
+    ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+    ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes"),
+]
+# v1 reports "no limit" as a huge number rather than "max"
+CGROUP_UNLIMITED = 1 << 60
+
+
+def _cgroup_available_mb():
+    for limit_path, usage_path in CGROUP_MEMORY_FILES:
+        try:
+            with open(limit_path) as f:
+                limit = f.read().strip()
+            with open(usage_path) as f:
+                usage = int(f.read().strip())
+        except (OSError, ValueError):
+            continue
+        if limit == "max" or int(limit) >= CGROUP_UNLIMITED:
+            return None
+        return (int(limit) - usage) / 1024 / 1024
+    return None
+
+
+def available_mb():
+    """Memory (MB) left to this container: its cgroup headroom and MemAvailable, whichever is lower.
+
+    None where neither can be read.
+    """
+    found = []
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    found.append(int(line.split()[1]) / 1024)
+                    break
+    except (OSError, ValueError, IndexError):
+        pass
+    cgroup = _cgroup_available_mb()
+    if cgroup is not None:
+        found.append(cgroup)
+    return min(found) if found else None
+
+
+class MemoryGovernor:
+    """How many scrapes may hold a browser context at once, given memory.
+
+    With budget_mb set, browsers may use up to that much in total; the
+    memory left to the container (available_mb()) minus reserve_mb always
+    applies as well. Each additional scrape is assumed to need scrape_mb
+    more. One scrape is always allowed so the service never stalls
+    completely.
+    """
+
+    def __init__(self, budget_mb=0.0, scrape_mb=250.0, reserve_mb=256.0, sample_interval=1.0):
+        self.budget_mb = budget_mb
+        self.scrape_mb = max(1.0, scrape_mb)
+        self.reserve_mb = reserve_mb
+        self.sample_interval = sample_interval
+        self._sampled_at = 0.0
+        self._procs = {}
+        self._pss = {}
+        self._available = None
+        self.waits = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            budget_mb=float(os.environ.get("BROWSER_MEMORY_BUDGET_MB", 0)),
+            scrape_mb=float(os.environ.get("SCRAPE_MEMORY_MB", 250)),
+            reserve_mb=float(os.environ.get("MEMORY_RESERVE_MB", 256)),
+        )
+
+    def sample(self, fresh=False):
+        """Process table, re-read at most every sample_interval seconds."""
+        now = time.monotonic()
+        if fresh or now - self._sampled_at >= self.sample_interval:
+            self._procs = snapshot()
+            # Only our own tree: smaps_rollup is too costly for every process
+            self._pss = {pid: pss_mb(pid) for pid in descendants(self._procs, os.getpid())}
+            self._available = available_mb()
+            self._sampled_at = now
+        return self._procs
+
+    def _mb(self, pid):
+        pss = self._pss.get(pid)
+        return pss if pss is not None else self._procs[pid].rss_mb
+
+    def tree_mb(self, root):
+        """PSS (MB) of root and all its descendants, RSS where PSS is unreadable."""
+        procs = self.sample()
+        if root not in procs:
+            return 0.0
+        return sum(self._mb(pid) for pid in [root] + descendants(procs, root))
+
+    def used_mb(self):
+        """PSS (MB) of every process this one spawned (browsers and the Playwright driver)."""
+        return sum(self._mb(pid) for pid in descendants(self.sample(), os.getpid()))
+
+    def headroom_mb(self):
+        """Memory left for more scrapes, or None when nothing limits it."""
+        used = self.used_mb()
+        limits = []
+        if self.budget_mb:
+            limits.append(self.budget_mb - used)
+        if self._available is not None:
+            limits.append(self._available - self.reserve_mb)
+        return min(limits) if limits else None
+
+    def limit(self, active):
+        """Concurrent scrapes allowed now that `active` are already running."""
+        headroom = self.headroom_mb()
+        if headroom is None:
+            return None
+        return max(1, active + int(headroom // self.scrape_mb))
+
+    def stats(self, active=0):
+        headroom = self.headroom_mb()
+        return {
+            "budgetMb": self.budget_mb,
+            "usedMb": round(self.used_mb(), 1),
+            "availableMb": round(self._available, 1) if self._available is not None else None,
+            "headroomMb": round(headroom, 1) if headroom is not None else None,
+            "scrapeMb": self.scrape_mb,
+            "concurrencyLimit": self.limit(active),
+            "waits": self.waits,
+        }
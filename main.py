@@ -1,14 +1,70 @@
 from fastapi import FastAPI, HTTPException, Body, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
-import subprocess
-import json
-import math
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Tuple
+import asyncio
 import os
+import time
+from contextlib import aclosing
 
-app = FastAPI(title="Let's Go! Backend API")
+import blocking
+import canonical
+import metrics
+import ranking
+import responses
+import scraper
+from engine import ScrapingEngine, EngineNotReady
+from scheduler import ScrapeScheduler, QueueFull
+from cache import ResultCache, STALE
+from singleflight import SingleFlight, Progress
+from place_store import PlaceStore, place_key
+from sessions import ParkedPages, Cursors
+from breaker import CircuitBreaker, AdaptiveRateLimiter, UpstreamDegraded, CLOSED
+from prefetch import Prefetcher
+
+app = FastAPI(title="Let's Go! Backend API", default_response_class=responses.CompactJSONResponse)
+
+# Warm Chromium pool shared by every scrape request (see engine.py)
+engine = ScrapingEngine.from_env()
+# Bounded, per-client fair queue in front of the engine (see scheduler.py)
+scheduler = ScrapeScheduler.from_env(default_workers=engine.capacity)
+# Scrape results keyed on the canonical request (see cache.py, canonical.py)
+result_cache = ResultCache.from_env()
+# Decimal places kept from user coordinates in cache keys (3 ~ 110 m)
+COORD_PRECISION = int(os.environ.get("CACHE_COORD_PRECISION", 3))
+# Identical concurrent scrapes share one browser session (see singleflight.py)
+inflight = SingleFlight()
+# Every scraped place is kept on disk and reused for nearby lookups (see
+# place_store.py); opened on startup so importing this module writes nothing
+place_store: Optional[PlaceStore] = None
+MAX_RESULTS = 5
+# Items per /api/scrape/batch call, and pages a batch may run at once
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 10))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 3))
+# Places scraped per query before ranking; over-fetching lets the ranking
+# stage pick the truly closest / best places rather than the first cards
+CANDIDATES = int(os.environ.get("SCRAPE_CANDIDATES", MAX_RESULTS * 4))
+# Default end-to-end budget (seconds) for a live scrape, queue wait included;
+# requests may ask for less with deadlineMs
+SCRAPE_TIMEOUT = float(os.environ.get("SCRAPE_TIMEOUT", 60))
+# Part of a scrape's budget kept back so the browser work winds down and
+# returns what it has before the hard timeout fires
+DEADLINE_GRACE = float(os.environ.get("SCRAPE_DEADLINE_GRACE", 1.0))
+# Live scraping pauses while upstream keeps failing, and outbound
+# navigations are paced by how upstream is responding (see breaker.py)
+upstream = CircuitBreaker.from_env(probe_timeout=SCRAPE_TIMEOUT)
+navigations = AdaptiveRateLimiter.from_env()
+# Result pages left open for "load more", and the cursors pointing at them (see sessions.py)
+parked_pages = ParkedPages.from_env(engine.release, engine.capacity)
+cursors = Cursors.from_env()
+# Upper bound on places per /api/scrape/more call
+MORE_MAX_RESULTS = int(os.environ.get("MORE_MAX_RESULTS", 20))
+# Suggestion responses: POST answers are revalidated with their ETag, GET
+# answers may be reused by browsers and CDNs for RESPONSE_MAX_AGE seconds
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+RESPONSE_MAX_AGE = int(os.environ.get("RESPONSE_MAX_AGE", 300))
+PUBLIC_CACHE_CONTROL = f"public, max-age={RESPONSE_MAX_AGE}, stale-while-revalidate={RESPONSE_MAX_AGE * 2}"
 
 # Update CORS for production (frontend domain) and local development
 origins = [
@@ -34,12 +90,40 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"error": "Internal Server Error", "details": str(exc)},
     )
 
+async def start_engine():
+    try:
+        # The Docker image already ships Chromium; only Nixpacks-style deploys
+        # need PLAYWRIGHT_INSTALL_ON_BOOT=1 to fetch it when it is missing
+        await engine.start(install_missing=os.environ.get("PLAYWRIGHT_INSTALL_ON_BOOT") == "1")
+        await engine.warm_up()
+        print(f"Scraping engine ready with {engine.capacity} pooled contexts")
+    except Exception as e:
+        engine.error = str(e)
+        print(f"Scraping engine failed to start: {str(e)}")
+
+_engine_start = None
+
 @app.on_event("startup")
-def startup_event():
-    # Force install the chromium browser on startup to guarantee it exists 
-    # regardless of whether Railway uses Docker or Nixpacks.
-    print("Ensuring Playwright Chromium is installed...")
-    os.system("playwright install chromium")
+async def startup_event():
+    global _engine_start, place_store
+    place_store = await asyncio.to_thread(PlaceStore.from_env)
+    await scheduler.start()
+    await parked_pages.start()
+    await prefetcher.start()
+    # Launch browsers in the background so the API binds immediately; /ready
+    # stays red until a browser is actually usable
+    _engine_start = asyncio.create_task(start_engine())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _engine_start is not None:
+        _engine_start.cancel()
+    await prefetcher.stop()
+    await scheduler.stop()
+    await parked_pages.stop()
+    await engine.stop()
+    if place_store is not None:
+        place_store.close()
 
 class ScrapeRequest(BaseModel):
     city: str
@@ -47,54 +131,718 @@ class ScrapeRequest(BaseModel):
     mood: Optional[str] = None
     userLat: Optional[float] = None
     userLng: Optional[float] = None
+    sort: Optional[str] = None
+    # Latency SLO for this request; capped at SCRAPE_TIMEOUT
+    deadlineMs: Optional[int] = None
+
+# Proxies in front of the API that append to X-Forwarded-For (Railway: 1).
+# Entries left of theirs are whatever the client sent and cannot be trusted
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", 1))
+
+def client_id(request: Request) -> str:
+    # The address our outermost trusted proxy saw is the real client
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and TRUSTED_PROXY_HOPS > 0:
+        hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+        if hops:
+            return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else "unknown"
 
 @app.get("/")
 def read_root():
     return {"status": "Let's Go! API is running"}
 
-@app.post("/api/scrape")
-async def scrape_google_maps(req: ScrapeRequest):
+@app.get("/ready")
+def read_ready():
+    if not engine.ready:
+        return JSONResponse(
+            status_code=503,
+            content={"ready": False, "error": engine.error},
+            headers={"Retry-After": "5"},
+        )
+    return {"ready": True, "contexts": engine.capacity}
+
+@app.get("/metrics")
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/stats")
+def read_stats():
+    return {
+        "queue": scheduler.stats(),
+        "engine": engine.stats(),
+        "cache": result_cache.stats(),
+        "singleFlight": inflight.stats(),
+        "placeStore": place_store.stats(),
+        "parkedPages": parked_pages.stats(),
+        "cursors": len(cursors),
+        "network": dict(blocking.TOTALS, profile=blocking.profile_from_env()),
+        "upstream": upstream.stats(),
+        "navigations": navigations.stats(),
+        "prefetch": prefetcher.stats(),
+        "canonical": collapse.stats(),
+    }
+
+def _quantize(coord: Optional[float]) -> Optional[float]:
+    return round(coord, COORD_PRECISION) if coord is not None else None
+
+# Gauges read at scrape time from the pipeline components
+metrics.Gauge("scrape_browser_pss_megabytes", "Memory (PSS) of all browser processes", fn=lambda: round(engine.memory.used_mb(), 1))
+metrics.Gauge(
+    "scrape_browser_process_pss_megabytes", "Memory (PSS) of each pooled browser's process tree", ("browser",),
+    fn=lambda: {(str(b["index"]),): b["pssMb"] or 0 for b in engine.browser_stats()},
+)
+metrics.Gauge("scrape_memory_concurrency_limit", "Scrapes the node's free memory allows at once", fn=lambda: engine.memory.limit(engine.active) or engine.capacity)
+metrics.Gauge("scrape_engine_ready", "1 once a warmed browser is usable", fn=lambda: int(engine.ready))
+metrics.Gauge("scrape_queue_depth", "Scrape jobs waiting for a worker", fn=lambda: scheduler.stats()["queueDepth"])
+metrics.Gauge("scrape_running", "Scrape jobs currently running", fn=lambda: scheduler.running)
+metrics.Gauge("scrape_cache_entries", "Entries in the result cache", fn=lambda: len(result_cache))
+metrics.Gauge("scrape_breaker_open", "1 while live scraping is paused by the circuit breaker", fn=lambda: int(upstream.state != "closed"))
+metrics.Gauge("scrape_navigation_rate", "Outbound navigations per second currently allowed", fn=lambda: navigations.rate)
+metrics.Gauge("scrape_parked_pages", "Result pages kept open for load-more", fn=lambda: len(parked_pages))
+metrics.Gauge("scrape_key_collapse_ratio", "Share of raw request forms served by an already-seen canonical key", fn=lambda: collapse.ratio())
+
+def canon(req: ScrapeRequest) -> canonical.Query:
+    return canonical.canonicalize(req.city, req.category, req.mood)
+
+def sort_mode_for(req: ScrapeRequest) -> str:
+    # Sort words typed into the category or mood ("closest", "الأفضل") count as a sort
+    has_location = req.userLat is not None and req.userLng is not None
+    return ranking.resolve_mode(req.sort or canon(req).sort, has_location)
+
+def cache_key(req: ScrapeRequest) -> tuple:
+    # Canonical, so "Coffee", "كافيهات" and "top rated café" share cache, flights and store rows
+    q = canon(req)
+    return (
+        q.city,
+        q.category,
+        q.mood,
+        sort_mode_for(req),
+        _quantize(req.userLat),
+        _quantize(req.userLng),
+    )
+
+# How many raw request forms the canonical keys fold together
+collapse = canonical.CollapseStats()
+
+def rank_for(places: List[Dict[str, Any]], req: ScrapeRequest, limit: Optional[int] = MAX_RESULTS) -> List[Dict[str, Any]]:
+    # Candidate pools are shared by nearby callers, so distance and order are per request
+    return ranking.rank(places, sort_mode_for(req), req.userLat, req.userLng, limit)
+
+def request_deadline(req: ScrapeRequest) -> float:
+    """Monotonic time by which a live scrape for req must answer."""
+    budget = SCRAPE_TIMEOUT
+    if req.deadlineMs:
+        budget = min(budget, max(req.deadlineMs, 1) / 1000)
+    return time.monotonic() + budget
+
+async def scrape_in_context(context, req: ScrapeRequest, key: tuple, report: scraper.ScrapeReport, on_place=None, park: bool = False,
+                            deadline: float = SCRAPE_TIMEOUT) -> List[Dict[str, Any]]:
+    """Scrape one request's candidate pool in an already-leased context.
+
+    deadline is the budget in seconds. When it runs out, the places found so
+    far are returned with report.partial set; only an empty scrape raises
+    asyncio.TimeoutError. With park=True the result page is left open on
+    report.session.
+    """
+    q = canon(req)
+    # Scrape from the quantized point so the result is valid for the whole key
+    lat, lng = key[4], key[5]
+    places = []
+
+    throttled_at = time.monotonic()
+    if not await navigations.acquire(max_wait=deadline / 2):
+        raise UpstreamDegraded("Outbound navigations are throttled", navigations.retry_after())
+    deadline -= time.monotonic() - throttled_at
+
+    async def collect():
+        # The scraper gets slightly less than the hard limit so it normally
+        # winds down on its own; aclosing closes the page even when cut off
+        budget = max(0.05, deadline - min(DEADLINE_GRACE, deadline * 0.2))
+        async with aclosing(scraper.iter_places(
+            context, q.query, q.city_query, lat, lng, CANDIDATES, sort_mode_for(req), mood=q.mood, deadline=budget,
+            report=report, snapshot_meta={"category": q.category, "mood": q.mood}, park=park,
+        )) as found:
+            async for place in found:
+                places.append(place)
+                if on_place is not None:
+                    on_place(place)
+
+    try:
+        await asyncio.wait_for(collect(), timeout=deadline)
+    except asyncio.TimeoutError:
+        metrics.TIMEOUTS.inc(stage="request")
+        if not places:
+            raise
+        report.partial = True
+    if report.partial:
+        metrics.PARTIALS.inc()
+    return places
+
+def observe_upstream(report: scraper.ScrapeReport):
+    """Feed one live scrape's outcome to the circuit breaker and the navigation limiter.
+
+    Only blocks (consent, captcha, navigation) count against upstream; a
+    search that came back with no feed or no cards was still answered.
+    """
+    if report.failure is None and not report.results:
+        # Out of budget before upstream showed anything either way
+        return
+    blocked = report.failure if report.failure in scraper.UPSTREAM_BLOCKS else None
+    upstream.record(blocked)
+    navigations.feedback(blocked)
+
+async def remember(req: ScrapeRequest, key: tuple, places: List[Dict[str, Any]], partial: bool = False):
+    """Keep a scraped pool in the result cache and the place store.
+
+    Partial pools still feed the place store but are not cached as the
+    answer for their key, so the next request scrapes again.
+    """
+    if not places:
+        return
+    if not partial:
+        result_cache.set(key, places)
+        prefetcher.stored(key)
+    try:
+        await asyncio.to_thread(place_store.upsert, places, req.city, canon(req).query)
+    except Exception as e:
+        print(f"Place store upsert failed: {str(e)}")
+
+async def fetch_places(req: ScrapeRequest, key: tuple, client: str, on_place=None, park: bool = True,
+                       low_priority: bool = False) -> Tuple[List[Dict[str, Any]], scraper.ScrapeReport]:
+    """Scrape req's candidate pool within its deadline; returns (places, report).
+
+    Queue wait and lease time come out of the same budget as the scrape.
+    Concurrent identical requests share the leader's scrape: on_place is
+    called for every place it extracts, whoever started it, and each caller
+    stops waiting at its own deadline with the places extracted by then.
+    """
+    report = scraper.ScrapeReport()
+    park = park and parked_pages.enabled
+    deadline_at = request_deadline(req)
+
+    async def run_scrape():
+        report.record("queue_wait", time.perf_counter() - submitted_at)
+        if time.monotonic() >= deadline_at:
+            metrics.TIMEOUTS.inc(stage="queue")
+            raise asyncio.TimeoutError()
+        leased_at = time.perf_counter()
+        if park and not engine.available and len(parked_pages):
+            # A parked page is holding the context this scrape needs
+            await parked_pages.evict_oldest()
+        slot = await engine.acquire(key[4], key[5])
+        report.record("lease", time.perf_counter() - leased_at)
+        try:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                metrics.TIMEOUTS.inc(stage="lease")
+                raise asyncio.TimeoutError()
+            places = await scrape_in_context(slot.context, req, key, report, progress.put, park, remaining)
+        except BaseException:
+            # Releasing the slot also closes any page left open for parking
+            report.session = None
+            await engine.release(slot)
+            observe_upstream(report)
+            raise
+        observe_upstream(report)
+        session, report.session = report.session, None
+        # A full candidate pool means the feed probably has more to scroll
+        if session is not None and len(places) >= CANDIDATES:
+            await parked_pages.park(key, session, slot)
+        else:
+            await engine.release(slot)
+        return places
+
+    async def scrape_and_cache():
+        if not upstream.allow():
+            raise UpstreamDegraded("Google Maps is failing; live scraping is paused", upstream.retry_after())
+        places = await scheduler.submit(client, run_scrape, low_priority)
+        await remember(req, key, places, report.partial)
+        return places, report
+
+    submitted_at = time.perf_counter()
+    wait = max(0.0, deadline_at - time.monotonic()) + DEADLINE_GRACE
+    # Live callers must not end up waiting behind a low-priority job, so
+    # background scrapes coalesce only among themselves
+    flight = ("_background",) + key if low_priority else key
+    # Places the flight's leader has extracted so far, shared with every caller
+    progress = Progress()
+    task, progress = inflight.start(flight, scrape_and_cache, progress)
+    if on_place is not None:
+        progress.subscribe(on_place)
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout=wait)
+    except asyncio.TimeoutError:
+        # A caller with a tighter deadline than the leader's still gets what has been found
+        if not progress.items:
+            raise
+        partial = scraper.ScrapeReport()
+        partial.partial = True
+        metrics.PARTIALS.inc()
+        return list(progress.items), partial
+    finally:
+        if on_place is not None:
+            progress.unsubscribe(on_place)
+
+_refreshing = set()
+
+def schedule_refresh(req: ScrapeRequest, key: tuple):
+    if key in _refreshing:
+        return
+
+    async def refresh():
+        try:
+            # Not the caller's SLO: a tight one would only ever bring back a partial pool, which is never cached
+            await fetch_places(req.model_copy(update={"deadlineMs": None}), key, "_refresh", park=False)
+        except Exception as e:
+            print(f"Background refresh failed: {str(e)}")
+        finally:
+            _refreshing.discard(key)
+
+    _refreshing.add(key)
+    asyncio.create_task(refresh())
+
+def area_request(req: ScrapeRequest) -> ScrapeRequest:
+    """req without the caller's location or SLO: what the prefetcher tracks and replays.
+
+    Coordinates would split one popular query across every caller's grid
+    cell; a city-wide scrape instead refreshes the place store, which then
+    answers nearby callers.
+    """
+    return req.model_copy(update={"userLat": None, "userLng": None, "deadlineMs": None})
+
+async def prefetch(req: ScrapeRequest, key: tuple):
+    await fetch_places(req, key, "_prefetch", park=False, low_priority=True)
+
+# Keeps the most requested keys cached ahead of expiry (see prefetch.py)
+prefetcher = Prefetcher.from_env(
+    prefetch, result_cache, allowed=lambda: engine.ready and upstream.state == CLOSED and scheduler.low_slots > 0
+)
+
+async def lookup_places(req: ScrapeRequest, key: tuple) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """Find a candidate pool in the result cache or the place store, without a browser."""
+    area = area_request(req)
+    area_key = cache_key(area)
+    prefetcher.record(area_key, area)
+    collapse.record((req.city, req.category, req.mood, req.sort, key[4], key[5]), key)
+    cached, state = result_cache.get(key)
+    if cached is not None:
+        if state == STALE:
+            schedule_refresh(req, key)
+        prefetcher.served(key, "cache", result_cache.age(key))
+        return cached, "cache"
+
+    # Recently covered areas are answered from the place store
+    stored = await asyncio.to_thread(
+        place_store.lookup, req.city, canon(req).query, req.userLat, req.userLng, CANDIDATES
+    )
+    if stored:
+        prefetcher.served(area_key, "store")
+        return stored, "store"
+    return None, None
+
+def first_page(req: ScrapeRequest, key: tuple, pool: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Rank a candidate pool into the first suggestions and a cursor for the rest."""
+    ranked = rank_for(pool, req, None)
+    page = ranked[:MAX_RESULTS]
+    if len(ranked) <= MAX_RESULTS and key not in parked_pages:
+        return page, None
+    state = {"req": req, "key": key, "pool": list(pool), "served": {place_key(p) for p in page}}
+    return page, cursors.create(state)
+
+def queue_full_response(e: QueueFull) -> JSONResponse:
+    return JSONResponse(
+        status_code=429 if e.per_client else 503,
+        content={"error": str(e), "retryAfter": e.retry_after},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+def degraded_response(e: UpstreamDegraded) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(e), "retryAfter": e.retry_after},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+async def fallback_places(req: ScrapeRequest) -> Optional[List[Dict[str, Any]]]:
+    """Stored places of any age, served while live scraping is unavailable."""
+    stored = await asyncio.to_thread(place_store.fallback, req.city, canon(req).query, req.userLat, req.userLng, CANDIDATES)
+    if stored:
+        metrics.REQUESTS.inc(source="fallback")
+    return stored or None
+
+def with_timings(body: Dict[str, Any], source: str, started: float, report: Optional[scraper.ScrapeReport] = None) -> Dict[str, Any]:
+    timings = dict(report.timings) if report else {}
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    body["timings"] = {"source": source, **timings}
+    return body
+
+async def answer_scrape(req: ScrapeRequest, request: Request, timings: bool = False):
+    """Suggestions body for one request, or an error Response when the queue is full."""
     if not req.city or not req.category:
         raise HTTPException(status_code=400, detail="City and category are required")
 
-    query = f"{req.mood} {req.category}" if req.mood else req.category
-    scraper_path = os.path.join(os.path.dirname(__file__), "scraper.py")
-    
-    args = ["python3", scraper_path, query, req.city, "--max", "5"]
-    
-    if req.mood:
-        args.extend(["--mood", req.mood])
-    if req.userLat is not None:
-        args.extend(["--lat", str(req.userLat)])
-    if req.userLng is not None:
-        args.extend(["--lng", str(req.userLng)])
+    started = time.perf_counter()
+    key = cache_key(req)
+    known, source = await lookup_places(req, key)
+    if known:
+        metrics.REQUESTS.inc(source=source)
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="lookup")
+        suggestions, cursor = first_page(req, key, known)
+        body = {"suggestions": suggestions, "cursor": cursor, "partial": False}
+        return with_timings(body, source, started) if timings else body
 
     try:
-        # Run the Playwright scraper script
-        result = subprocess.run(
-            args,
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
-        
-        if result.returncode != 0:
-            print("Scraper stderr:", result.stderr)
-            raise Exception(f"Scraper failed with code {result.returncode}")
-            
-        # Parse the JSON output from the scraper
-        data = json.loads(result.stdout)
-        return data
-
-    except subprocess.TimeoutExpired:
+        places, report = await fetch_places(req, key, client_id(request))
+        metrics.REQUESTS.inc(source="live")
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage="total")
+        suggestions, cursor = first_page(req, key, places)
+        # partial: the deadline ran out and these are the places found by then
+        body = {"suggestions": suggestions, "cursor": cursor, "partial": report.partial}
+        if report.failure:
+            # Why a live scrape came back empty: consent, captcha, no_feed, no_cards or navigation
+            body["failure"] = report.failure
+        return with_timings(body, "live", started, report) if timings else body
+
+    except QueueFull as e:
+        return queue_full_response(e)
+    except UpstreamDegraded as e:
+        # Older stored places beat an error while Maps is blocking us
+        stored = await fallback_places(req)
+        if not stored:
+            return degraded_response(e)
+        suggestions, cursor = first_page(req, key, stored)
+        body = {"suggestions": suggestions, "cursor": cursor, "partial": False, "degraded": True}
+        return with_timings(body, "fallback", started) if timings else body
+    except EngineNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except asyncio.TimeoutError:
         raise HTTPException(status_code=504, detail="Scraping timed out")
-    except json.JSONDecodeError:
-        print("Raw output:", result.stdout)
-        raise HTTPException(status_code=500, detail="Failed to parse scraper output")
     except Exception as e:
         print(f"Scrape error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/scrape")
+async def scrape_google_maps(req: ScrapeRequest, request: Request, timings: bool = False):
+    body = await answer_scrape(req, request, timings)
+    if isinstance(body, Response):
+        return body
+    # Cursors and timings differ per response, so only the suggestions make the ETag
+    return responses.conditional_json(request, body, PRIVATE_CACHE_CONTROL, validator=body["suggestions"])
+
+@app.get("/api/scrape")
+async def get_google_maps(request: Request, city: str, category: str, mood: Optional[str] = None,
+                          userLat: Optional[float] = None, userLng: Optional[float] = None, sort: Optional[str] = None,
+                          deadlineMs: Optional[int] = None):
+    """Cacheable form of POST /api/scrape for browser and CDN caches.
+
+    Shared caches would hand one cursor to many clients, so the answer
+    carries none; use POST /api/scrape to page further.
+    """
+    req = ScrapeRequest(city=city, category=category, mood=mood, userLat=userLat, userLng=userLng, sort=sort, deadlineMs=deadlineMs)
+    body = await answer_scrape(req, request)
+    if isinstance(body, Response):
+        return body
+    cursor = body.pop("cursor", None)
+    if cursor:
+        cursors.drop(cursor)
+    # A partial answer must not be reused as if it were complete
+    cache_control = PRIVATE_CACHE_CONTROL if body["partial"] else PUBLIC_CACHE_CONTROL
+    return responses.conditional_json(request, body, cache_control, validator=body["suggestions"])
+
+def _format_event(event: Dict[str, Any], sse: bool) -> str:
+    data = responses.dumps(event).decode("utf-8")
+    if sse:
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+@app.post("/api/scrape/stream")
+async def stream_google_maps(req: ScrapeRequest, request: Request):
+    """Push each place as it is extracted, as NDJSON or Server-Sent Events.
+
+    Every place arrives as a {"type": "place"} event and the stream ends
+    with a {"type": "done"} summary carrying the full suggestions list, a
+    cursor for /api/scrape/more and whether the deadline cut it short.
+    """
+    if not req.city or not req.category:
+        raise HTTPException(status_code=400, detail="City and category are required")
+
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    key = cache_key(req)
+
+    def replay(pool, **extra):
+        suggestions, cursor = first_page(req, key, pool)
+
+        async def events():
+            for place in suggestions:
+                yield _format_event({"type": "place", "place": place}, sse)
+            yield _format_event({"type": "done", "count": len(suggestions), "suggestions": suggestions,
+                                 "cursor": cursor, "partial": False, **extra}, sse)
+        return StreamingResponse(events(), media_type=media_type)
+
+    known, source = await lookup_places(req, key)
+    if known:
+        metrics.REQUESTS.inc(source=source)
+        return replay(known)
+
+    events = asyncio.Queue()
+    done = object()
+    task = asyncio.create_task(fetch_places(req, key, client_id(request), on_place=events.put_nowait))
+    task.add_done_callback(lambda _: events.put_nowait(done))
+
+    # Hold the response until the first place (or failure) so queue
+    # rejections still get a proper status code and Retry-After header
+    first = await events.get()
+    if first is done and task.exception() is not None:
+        e = task.exception()
+        if isinstance(e, QueueFull):
+            return queue_full_response(e)
+        if isinstance(e, UpstreamDegraded):
+            stored = await fallback_places(req)
+            return replay(stored, degraded=True) if stored else degraded_response(e)
+        if isinstance(e, EngineNotReady):
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+        if isinstance(e, asyncio.TimeoutError):
+            raise HTTPException(status_code=504, detail="Scraping timed out")
+        print(f"Scrape error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def relay():
+        # Early cards are a preview in extraction order; the summary carries
+        # the ranked list once the whole candidate pool is in
+        item, sent = first, 0
+        while item is not done:
+            if sent < MAX_RESULTS:
+                yield _format_event({"type": "place", "place": rank_for([item], req)[0]}, sse)
+                sent += 1
+            item = await events.get()
+        if task.exception() is not None:
+            yield _format_event({"type": "error", "error": str(task.exception())}, sse)
+            return
+        pool, report = task.result()
+        places, cursor = first_page(req, key, pool)
+        yield _format_event({"type": "done", "count": len(places), "suggestions": places, "cursor": cursor, "partial": report.partial}, sse)
+
+    return StreamingResponse(relay(), media_type=media_type)
+
+class MoreRequest(BaseModel):
+    cursor: str
+    max: Optional[int] = None
+
+async def continue_session(state: Dict[str, Any], count: int, client: str) -> List[Dict[str, Any]]:
+    """Scroll a parked page further for up to count new places, then re-park it."""
+    key = state["key"]
+    taken = parked_pages.take(key)
+    if taken is None:
+        return []
+    session, slot = taken
+
+    async def scroll_more():
+        return await session.more(count)
+
+    try:
+        places = await asyncio.wait_for(scheduler.submit(client, scroll_more), timeout=SCRAPE_TIMEOUT)
+    except BaseException:
+        await engine.release(slot)
+        raise
+    # Places found by an earlier cursor on the same page are already pooled
+    known = {place_key(p) for p in state["pool"]}
+    places = [p for p in places if place_key(p) not in known]
+    if len(places) >= count:
+        await parked_pages.park(key, session, slot)
+    else:
+        # The feed ran dry before filling the request
+        await engine.release(slot)
+    return places
+
+@app.post("/api/scrape/more")
+async def scrape_more(more: MoreRequest, request: Request):
+    """Return the next places for a cursor from /api/scrape.
+
+    Overflow candidates that were already extracted are served first; once
+    they run out, a parked result page is scrolled further. The response
+    carries a new cursor, or null when nothing more can be fetched.
+    """
+    state = cursors.get(more.cursor)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired cursor")
+    req, key = state["req"], state["key"]
+    count = max(1, min(more.max or MAX_RESULTS, MORE_MAX_RESULTS))
+
+    def unserved():
+        return [p for p in rank_for(state["pool"], req, None) if place_key(p) not in state["served"]]
+
+    remaining = unserved()
+    source = "overflow"
+    if len(remaining) < count and key in parked_pages:
+        try:
+            found = await continue_session(state, count - len(remaining), client_id(request))
+        except QueueFull as e:
+            return queue_full_response(e)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Scraping timed out")
+        except Exception as e:
+            print(f"Load more error: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+        if found:
+            source = "session"
+            state["pool"].extend(found)
+            await remember(req, key, list(state["pool"]))
+            remaining = unserved()
+
+    page = remaining[:count]
+    state["served"].update(place_key(p) for p in page)
+    metrics.REQUESTS.inc(source=f"more_{source}")
+    cursor = more.cursor
+    if len(remaining) <= count and key not in parked_pages:
+        cursors.drop(cursor)
+        cursor = None
+    return {"suggestions": page, "cursor": cursor, "source": source}
+
+class BatchRequest(BaseModel):
+    items: List[ScrapeRequest]
+    concurrency: Optional[int] = Field(None, ge=1)
+
+def _error_status(e: Exception) -> int:
+    if isinstance(e, QueueFull):
+        return 429 if e.per_client else 503
+    if isinstance(e, (EngineNotReady, UpstreamDegraded)):
+        return 503
+    if isinstance(e, asyncio.TimeoutError):
+        return 504
+    return 500
+
+async def run_batch(batch: BatchRequest, client: str, on_item):
+    """Answer every batch item, calling on_item(result) as each one finishes.
+
+    Cached or stored items are answered immediately. The rest run as
+    concurrent pages inside one leased browser context, so the batch pays
+    for a single queue slot and context setup instead of one per query.
+    """
+    # Misses grouped by cache key, so duplicate items share one page
+    misses = {}
+    for index, req in enumerate(batch.items):
+        if not req.city or not req.category:
+            on_item({"index": index, "error": "City and category are required", "status": 400})
+            continue
+        key = cache_key(req)
+        known, source = await lookup_places(req, key)
+        if known:
+            metrics.REQUESTS.inc(source=source)
+            suggestions, cursor = first_page(req, key, known)
+            on_item({"index": index, "source": source, "suggestions": suggestions, "cursor": cursor, "partial": False})
+        else:
+            misses.setdefault(key, []).append((index, req))
+    if not misses:
+        return
+
+    async def degrade(key, group, e: UpstreamDegraded):
+        for index, req in group:
+            stored = await fallback_places(req)
+            if stored:
+                suggestions, cursor = first_page(req, key, stored)
+                on_item({"index": index, "source": "fallback", "suggestions": suggestions, "cursor": cursor,
+                         "partial": False, "degraded": True})
+            else:
+                on_item({"index": index, "error": str(e), "status": 503, "retryAfter": e.retry_after})
+
+    if not upstream.allow():
+        e = UpstreamDegraded("Google Maps is failing; live scraping is paused", upstream.retry_after())
+        for key, group in misses.items():
+            await degrade(key, group, e)
+        return
+
+    limit = min(batch.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+    # Budgets start now, so queue wait and earlier pages count against them
+    deadlines = {key: min(request_deadline(req) for _, req in group) for key, group in misses.items()}
+
+    async def scrape_all():
+        first = next(iter(misses))
+        async with engine.lease(first[4], first[5]) as context:
+            pages = asyncio.Semaphore(limit)
+
+            async def one(key, group):
+                async with pages:
+                    req = group[0][1]
+                    report = scraper.ScrapeReport()
+                    try:
+                        remaining = deadlines[key] - time.monotonic()
+                        if remaining <= 0:
+                            metrics.TIMEOUTS.inc(stage="queue")
+                            raise asyncio.TimeoutError()
+                        try:
+                            places = await scrape_in_context(context, req, key, report, deadline=remaining)
+                        finally:
+                            observe_upstream(report)
+                        await remember(req, key, places, report.partial)
+                    except UpstreamDegraded as e:
+                        await degrade(key, group, e)
+                        return
+                    except Exception as e:
+                        for index, _ in group:
+                            on_item({"index": index, "error": str(e) or type(e).__name__, "status": _error_status(e)})
+                        return
+                    for index, item_req in group:
+                        metrics.REQUESTS.inc(source="live")
+                        suggestions, cursor = first_page(item_req, key, places)
+                        on_item({"index": index, "source": "live", "suggestions": suggestions, "cursor": cursor, "partial": report.partial})
+
+            await asyncio.gather(*(one(key, group) for key, group in misses.items()))
+
+    try:
+        await scheduler.submit(client, scrape_all)
+    except Exception as e:
+        for index, _ in (entry for group in misses.values() for entry in group):
+            item = {"index": index, "error": str(e) or type(e).__name__, "status": _error_status(e)}
+            if isinstance(e, QueueFull):
+                item["retryAfter"] = e.retry_after
+            on_item(item)
+
+@app.post("/api/scrape/batch")
+async def scrape_batch(batch: BatchRequest, request: Request, stream: bool = False):
+    """Run several scrape requests over one shared browser context.
+
+    Returns {"results": [...]} in request order, each item carrying either
+    suggestions or an error and status. With ?stream=true, items are sent as
+    NDJSON {"type": "item"} events as they finish, then a {"type": "done"}.
+    """
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+
+    client = client_id(request)
+    if not stream:
+        results = []
+        await run_batch(batch, client, results.append)
+        results.sort(key=lambda item: item["index"])
+        validator = [(item["index"], item.get("suggestions"), item.get("error")) for item in results]
+        return responses.conditional_json(request, {"results": results}, PRIVATE_CACHE_CONTROL, validator=validator)
+
+    events = asyncio.Queue()
+    done = object()
+
+    async def produce():
+        try:
+            await run_batch(batch, client, lambda item: events.put_nowait({"type": "item", **item}))
+        finally:
+            events.put_nowait(done)
+
+    async def relay():
+        task = asyncio.create_task(produce())
+        count = 0
+        while True:
+            event = await events.get()
+            if event is done:
+                break
+            count += 1
+            yield _format_event(event, False)
+        await task
+        yield _format_event({"type": "done", "count": count}, False)
+
+    return StreamingResponse(relay(), media_type="application/x-ndjson")
+
 if __name__ == "__main__":
     import uvicorn
     # Fetch PORT from Railway's environment variable, default to 3001 for local dev
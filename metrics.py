@@ -0,0 +1,154 @@
+"""
+Minimal Prometheus metrics for the scrape pipeline.
+
+Counters, gauges and histograms register themselves in REGISTRY and
+render() produces the text exposition format served on /metrics. Gauges
+may be backed by a callback so values like browser memory are read at scrape
+time instead of being pushed from the hot path.
+"""
+
+import math
+import threading
+
+REGISTRY = []
+
+# Seconds; spans fast cache hits up to the scrape timeout
+DEFAULT_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _key(labelnames, labels):
+    return tuple(labels.get(n, "") for n in labelnames)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_key(self.labelnames, labels), 0)
+
+    def render(self):
+        lines = self._header()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), fn=None):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+        # fn() returns a number, or a {label-tuple: number} dict for labelled gauges
+        self._fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_key(self.labelnames, labels)] = value
+
+    def render(self):
+        lines = self._header()
+        values = dict(self._values)
+        if self._fn is not None:
+            try:
+                result = self._fn()
+            except Exception:
+                result = None
+            if isinstance(result, dict):
+                values.update(result)
+            elif result is not None:
+                values[()] = result
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = _key(self.labelnames, labels)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[key] = (counts, total + value)
+
+    def render(self):
+        lines = self._header()
+        for key, (counts, total) in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, counts):
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                labels = _labels(self.labelnames + ("le",), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {counts[-1]}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Pipeline metrics shared by main.py, scraper.py and engine.py
+STAGE_SECONDS = Histogram(
+    "scrape_stage_seconds",
+    "Time spent in each stage of the scrape pipeline",
+    ("stage",),
+)
+REQUESTS = Counter("scrape_requests_total", "Scrape requests by where the answer came from", ("source",))
+RESULTS = Counter("scrape_results_total", "Places returned by live scrapes")
+CONSENT_HITS = Counter("scrape_consent_total", "Scrapes that hit a consent dialog")
+TIMEOUTS = Counter("scrape_timeouts_total", "Timeouts by stage", ("stage",))
+PARSE_FAILURES = Counter("scrape_parse_failures_total", "Result cards that could not be parsed")
+UPSTREAM_FAILURES = Counter("scrape_upstream_failures_total", "Scrapes stopped by upstream, by kind", ("kind",))
+PARTIALS = Counter("scrape_partial_total", "Live scrapes answered with partial results after running out of budget")
+PREFETCHES = Counter("scrape_prefetch_total", "Background prefetch refreshes by outcome", ("outcome",))
+PREFETCH_HITS = Counter("scrape_prefetch_hits_total", "Cache hits answered by an entry a prefetch stored")
+BROWSER_RECYCLES = Counter("scrape_browser_recycles_total", "Browsers relaunched, by reason (pss, pages, disconnected)", ("reason",))
+ORPHANS_REAPED = Counter("scrape_orphans_reaped_total", "Orphaned Chromium browsers killed")
+MEMORY_WAITS = Counter("scrape_memory_waits_total", "Scrapes that waited for memory before getting a browser context")
+SERVED_AGE = Histogram(
+    "scrape_served_age_seconds",
+    "Age of cached results when they are served",
+    buckets=(30, 60, 120, 300, 600, 900, 1200, 1800, 2700),
+)
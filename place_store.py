@@ -0,0 +1,264 @@
+"""
+Persistent SQLite store of scraped places.
+
+Places are upserted by their Maps place id (or their coordinates when the
+link carries no id) and indexed in an R-tree, so "closest cafés near a
+point" can be answered without a browser. A place can turn up under
+several searches (a café that also serves breakfast), so which
+(city, category) pairs it belongs to is kept in its own table. A coverage
+table records when each (city, category) pair was last scraped, which
+decides whether the store is recent enough to trust. Cities and
+categories are stored in canonical form (see canonical.py), so rows written
+for "Coffee", "كافيهات" or "cafe" serve each other.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import canonical
+from ranking import haversine_many
+from scraper import place_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    place_key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    address TEXT,
+    rating REAL,
+    reviews INTEGER,
+    lat REAL,
+    lng REAL,
+    city TEXT NOT NULL,
+    category TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS places_city_category ON places (city, category);
+CREATE TABLE IF NOT EXISTS place_categories (
+    place_id INTEGER NOT NULL REFERENCES places (id),
+    city TEXT NOT NULL,
+    category TEXT NOT NULL,
+    PRIMARY KEY (city, category, place_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS places_rtree USING rtree (id, min_lat, max_lat, min_lng, max_lng);
+CREATE TABLE IF NOT EXISTS coverage (
+    city TEXT NOT NULL,
+    category TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    places INTEGER NOT NULL,
+    PRIMARY KEY (city, category)
+);
+"""
+
+
+def _key(city, category):
+    """Canonical (city, category) for storage; category may carry mood words ("quiet cafe")."""
+    q = canonical.canonicalize(city, category)
+    return q.city, canonical.normalize(q.query)
+
+
+def _row_to_place(row, distance=None):
+    key, name, address, rating, reviews, lat, lng = row
+    return {
+        "placeId": None if key.startswith("name:") or "," in key else key,
+        "name": name,
+        "address": address,
+        "rating": rating,
+        "reviews": reviews,
+        "lat": lat,
+        "lng": lng,
+        "distanceKm": round(distance, 1) if distance is not None else None,
+    }
+
+
+class PlaceStore:
+    """Thread-safe wrapper around one SQLite connection."""
+
+    def __init__(self, path, max_age=3 * 86400, radius_km=5.0, min_places=5):
+        self.path = path
+        self.max_age = max_age
+        self.radius_km = radius_km
+        self.min_places = min_places
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self.hits = 0
+        self.misses = 0
+
+    def _migrate(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # Stores written before place_categories existed only know each
+            # place's first category
+            with self._conn:
+                self._conn.execute("INSERT OR IGNORE INTO place_categories SELECT id, city, category FROM places")
+                self._conn.execute("PRAGMA user_version = 1")
+        if version < 2:
+            # Rows keyed on lowercased raw text move to their canonical key
+            with self._conn:
+                for city, category in self._conn.execute("SELECT DISTINCT city, category FROM place_categories").fetchall():
+                    new = _key(city, category)
+                    if new != (city, category):
+                        self._conn.execute(
+                            "INSERT OR IGNORE INTO place_categories SELECT place_id, ?, ? FROM place_categories WHERE city = ? AND category = ?",
+                            (*new, city, category),
+                        )
+                        self._conn.execute("DELETE FROM place_categories WHERE city = ? AND category = ?", (city, category))
+                for city, category, updated_at, places in self._conn.execute("SELECT * FROM coverage").fetchall():
+                    new = _key(city, category)
+                    if new != (city, category):
+                        self._conn.execute("DELETE FROM coverage WHERE city = ? AND category = ?", (city, category))
+                        self._conn.execute(
+                            """
+                            INSERT INTO coverage (city, category, updated_at, places) VALUES (?, ?, ?, ?)
+                            ON CONFLICT (city, category) DO UPDATE SET
+                                updated_at = MAX(coverage.updated_at, excluded.updated_at),
+                                places = coverage.places + excluded.places
+                            """,
+                            (*new, updated_at, places),
+                        )
+                self._conn.execute("PRAGMA user_version = 2")
+
+    @classmethod
+    def from_env(cls):
+        path = os.environ.get("PLACE_STORE_PATH")
+        if not path:
+            # A per-user data directory, never the source tree
+            data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+            path = os.path.join(data_home, "lets-go", "places.db")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return cls(
+            path,
+            max_age=float(os.environ.get("PLACE_STORE_MAX_AGE", 3 * 86400)),
+            radius_km=float(os.environ.get("PLACE_STORE_RADIUS_KM", 5)),
+            min_places=int(os.environ.get("PLACE_STORE_MIN_PLACES", 5)),
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def upsert(self, places, city, category):
+        """Insert or refresh places and mark (city, category) as covered."""
+        city, category = _key(city, category)
+        now = time.time()
+        with self._lock, self._conn:
+            for place in places:
+                cur = self._conn.execute(
+                    """
+                    INSERT INTO places (place_key, name, address, rating, reviews, lat, lng, city, category, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (place_key) DO UPDATE SET
+                        name = excluded.name,
+                        address = excluded.address,
+                        rating = COALESCE(excluded.rating, places.rating),
+                        reviews = COALESCE(excluded.reviews, places.reviews),
+                        lat = COALESCE(excluded.lat, places.lat),
+                        lng = COALESCE(excluded.lng, places.lng),
+                        updated_at = excluded.updated_at
+                    RETURNING id, lat, lng
+                    """,
+                    (place_key(place), place["name"], place.get("address"), place.get("rating"),
+                     place.get("reviews"), place.get("lat"), place.get("lng"), city, category, now),
+                )
+                row_id, lat, lng = cur.fetchone()
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO place_categories (place_id, city, category) VALUES (?, ?, ?)",
+                    (row_id, city, category),
+                )
+                if lat is not None and lng is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO places_rtree VALUES (?, ?, ?, ?, ?)",
+                        (row_id, lat, lat, lng, lng),
+                    )
+            self._conn.execute(
+                """
+                INSERT INTO coverage (city, category, updated_at, places) VALUES (?, ?, ?, ?)
+                ON CONFLICT (city, category) DO UPDATE SET
+                    updated_at = excluded.updated_at,
+                    places = coverage.places + excluded.places
+                """,
+                (city, category, now, len(places)),
+            )
+
+    def is_fresh(self, city, category):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at FROM coverage WHERE city = ? AND category = ?",
+                _key(city, category),
+            ).fetchone()
+        return row is not None and time.time() - row[0] <= self.max_age
+
+    def nearby(self, city, category, lat, lng, limit=None, radius_km=None):
+        """Closest stored places around (lat, lng), nearest first."""
+        radius_km = radius_km or self.radius_km
+        d_lat = radius_km / 111.32
+        d_lng = radius_km / max(111.32 * math.cos(math.radians(lat)), 1e-6)
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT p.place_key, p.name, p.address, p.rating, p.reviews, p.lat, p.lng
+                FROM places_rtree r
+                JOIN place_categories c ON c.place_id = r.id
+                JOIN places p ON p.id = r.id
+                WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lng >= ? AND r.max_lng <= ?
+                  AND c.city = ? AND c.category = ?
+                """,
+                (lat - d_lat, lat + d_lat, lng - d_lng, lng + d_lng, *_key(city, category)),
+            ).fetchall()
+
+        if not rows:
+            return []
+        # R-tree rows always have coordinates; the box corners still need trimming to the circle
+        distances = haversine_many(lat, lng, np.array([r[5] for r in rows]), np.array([r[6] for r in rows]))
+        order = np.argsort(distances, kind="stable")
+        order = order[distances[order] <= radius_km][:limit]
+        return [_row_to_place(rows[i], float(distances[i])) for i in order]
+
+    def fallback(self, city, category, lat=None, lng=None, limit=20):
+        """Stored places of any age, for when live scraping is unavailable."""
+        if lat is not None and lng is not None:
+            places = self.nearby(city, category, lat, lng, limit)
+            if places:
+                return places
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT p.place_key, p.name, p.address, p.rating, p.reviews, p.lat, p.lng
+                FROM place_categories c JOIN places p ON p.id = c.place_id
+                WHERE c.city = ? AND c.category = ?
+                ORDER BY p.reviews IS NULL, p.reviews DESC LIMIT ?
+                """,
+                (*_key(city, category), limit),
+            ).fetchall()
+        return [_row_to_place(row) for row in rows]
+
+    def lookup(self, city, category, lat, lng, limit):
+        """Answer from the store when coverage is recent and dense enough."""
+        if lat is None or lng is None or not self.is_fresh(city, category):
+            self.misses += 1
+            return None
+        places = self.nearby(city, category, lat, lng, limit)
+        if len(places) < min(limit, self.min_places):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return places
+
+    def stats(self):
+        with self._lock:
+            places = self._conn.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+            covered = self._conn.execute("SELECT COUNT(*) FROM coverage").fetchone()[0]
+        return {
+            "places": places,
+            "coveredQueries": covered,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,162 @@
+"""
+Popularity-driven background prefetching.
+
+Every lookup bumps an exponentially decaying score for its query without
+the caller's location, so the hot (city, category, mood, sort)
+combinations the frontend offers rise to the top however spread out their
+callers are. A background loop periodically takes the top-N keys and
+re-scrapes any whose cache entry is missing or will expire within `lead`
+seconds; those city-wide scrapes also refresh the place store that
+answers nearby callers. Refreshes go through the scheduler's low-priority lane, one at a
+time, and only while the caller-supplied `allowed()` says upstream is
+healthy, so prefetching fills idle capacity and never competes with live
+requests.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import metrics
+
+
+class Popularity:
+    """Decaying request counts per key, remembering one request to replay."""
+
+    def __init__(self, half_life=3600.0, max_keys=1000):
+        self.half_life = half_life
+        self.max_keys = max(1, max_keys)
+        self._scores = {}
+
+    def _decayed(self, score, updated_at, now):
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def record(self, key, request):
+        now = time.monotonic()
+        score, updated_at, _ = self._scores.get(key, (0.0, now, None))
+        self._scores[key] = (self._decayed(score, updated_at, now) + 1, now, request)
+        if len(self._scores) > self.max_keys:
+            # Drop the coldest key
+            coldest = min(self._scores, key=lambda k: self._decayed(self._scores[k][0], self._scores[k][1], now))
+            del self._scores[coldest]
+
+    def top(self, n):
+        """[(key, request, score)] for the n hottest keys, hottest first."""
+        now = time.monotonic()
+        ranked = sorted(
+            ((key, request, self._decayed(score, updated_at, now)) for key, (score, updated_at, request) in self._scores.items()),
+            key=lambda item: item[2],
+            reverse=True,
+        )
+        return ranked[:n]
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class Prefetcher:
+    """Keeps the hottest keys' cache entries fresh from a background task."""
+
+    def __init__(self, refresh, cache, allowed=None, top_n=20, interval=30.0, lead=120.0, half_life=3600.0, min_score=2.0):
+        # refresh(request, key) scrapes and stores one key; allowed() gates every refresh
+        self._refresh = refresh
+        self._cache = cache
+        self._allowed = allowed or (lambda: True)
+        self.top_n = max(0, top_n)
+        self.interval = interval
+        self.lead = lead
+        self.min_score = min_score
+        self.popularity = Popularity(half_life)
+        self._task = None
+        # Keys whose current cache entry was stored by a prefetch
+        self._prefetched = set()
+        self.refreshed = 0
+        self.failed = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    @classmethod
+    def from_env(cls, refresh, cache, allowed=None):
+        return cls(
+            refresh, cache, allowed,
+            top_n=int(os.environ.get("PREFETCH_TOP_N", 20)),
+            interval=float(os.environ.get("PREFETCH_INTERVAL", 30)),
+            lead=float(os.environ.get("PREFETCH_LEAD", 120)),
+            half_life=float(os.environ.get("PREFETCH_HALF_LIFE", 3600)),
+            min_score=float(os.environ.get("PREFETCH_MIN_SCORE", 2)),
+        )
+
+    async def start(self):
+        if self._task is None and self.top_n:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def record(self, key, request):
+        self.popularity.record(key, request)
+
+    def served(self, key, source, age=None):
+        """Note one answer served without scraping, for hit-rate and staleness metrics.
+
+        key is whatever answered: the cache entry's key, or for the place
+        store the query key whose area scrape filled it.
+        """
+        if age is not None:
+            metrics.SERVED_AGE.observe(age)
+        if source in ("cache", "store") and key in self._prefetched:
+            self.hits += 1
+            metrics.PREFETCH_HITS.inc()
+
+    def stored(self, key):
+        # A live scrape replaced the entry, so later hits are not ours
+        self._prefetched.discard(key)
+
+    def due(self):
+        """Hot keys whose cache entry is missing or about to expire."""
+        keys = []
+        for key, request, score in self.popularity.top(self.top_n):
+            if score < self.min_score:
+                break
+            age = self._cache.age(key)
+            if age is None or age >= self._cache.ttl - self.lead:
+                keys.append((key, request))
+        return keys
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            for key, request in self.due():
+                if not self._allowed():
+                    break
+                started = time.perf_counter()
+                try:
+                    await self._refresh(request, key)
+                except Exception as e:
+                    self.failed += 1
+                    metrics.PREFETCHES.inc(outcome="failed")
+                    print(f"Prefetch failed: {str(e)}", file=sys.stderr)
+                    continue
+                finally:
+                    elapsed = time.perf_counter() - started
+                    self.seconds += elapsed
+                    metrics.STAGE_SECONDS.observe(elapsed, stage="prefetch")
+                self.refreshed += 1
+                self._prefetched.add(key)
+                metrics.PREFETCHES.inc(outcome="refreshed")
+
+    def stats(self):
+        attempts = self.refreshed + self.failed
+        return {
+            "trackedKeys": len(self.popularity),
+            "topN": self.top_n,
+            "due": len(self.due()) if self.top_n else 0,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "hits": self.hits,
+            "hitsPerRefresh": round(self.hits / self.refreshed, 2) if self.refreshed else 0.0,
+            "avgRefreshSeconds": round(self.seconds / attempts, 2) if attempts else 0.0,
+        }
@@ -0,0 +1,87 @@
+"""
+Ranking stage for scraped candidates.
+
+Scores the whole candidate pool in one vectorized NumPy pass and returns
+the top places for a sort mode:
+
+- distance:  nearest first (unknown distances last)
+- rating:    highest star rating first, review count breaking ties
+- bayesian:  star rating shrunk towards the pool mean by review count
+- composite: bayesian quality blended with proximity and popularity
+"""
+
+import numpy as np
+
+SORT_MODES = ("distance", "rating", "bayesian", "composite")
+ALIASES = {"stars": "rating", "trending": "composite", "popular": "composite"}
+
+# Reviews a place needs before its own rating outweighs the pool average
+BAYES_PRIOR_REVIEWS = 50
+EARTH_RADIUS_KM = 6371.0
+
+
+def resolve_mode(mode, has_location=False):
+    mode = ALIASES.get((mode or "").lower(), (mode or "").lower())
+    if mode in SORT_MODES:
+        return mode
+    return "distance" if has_location else "bayesian"
+
+
+def haversine_many(lat, lng, lats, lngs):
+    """Distances (km) from one point to arrays of points; NaN where unknown."""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _column(places, field, fill=np.nan):
+    return np.array([p.get(field) if p.get(field) is not None else fill for p in places], dtype=float)
+
+
+def bayesian_scores(ratings, reviews, prior=BAYES_PRIOR_REVIEWS):
+    rated = ~np.isnan(ratings)
+    mean = ratings[rated].mean() if rated.any() else 0.0
+    r = np.where(rated, ratings, mean)
+    v = np.where(rated, reviews, 0.0)
+    return (v / (v + prior)) * r + (prior / (v + prior)) * mean
+
+
+def rank(places, mode, user_lat=None, user_lng=None, limit=None):
+    """Return copies of places, ranked for mode, with distanceKm filled in."""
+    if not places:
+        return []
+    has_location = user_lat is not None and user_lng is not None
+    mode = resolve_mode(mode, has_location)
+
+    lats = _column(places, "lat")
+    lngs = _column(places, "lng")
+    ratings = _column(places, "rating")
+    reviews = _column(places, "reviews", fill=0.0)
+
+    if has_location:
+        distances = haversine_many(user_lat, user_lng, lats, lngs)
+    else:
+        distances = np.full(len(places), np.nan)
+    bayes = bayesian_scores(ratings, reviews)
+
+    if mode == "distance":
+        # lexsort uses the last key as primary
+        order = np.lexsort((-bayes, np.nan_to_num(distances, nan=np.inf)))
+    elif mode == "rating":
+        order = np.lexsort((-reviews, -np.nan_to_num(ratings, nan=-1.0)))
+    elif mode == "bayesian":
+        order = np.argsort(-bayes, kind="stable")
+    else:
+        quality = bayes / 5.0
+        proximity = np.where(np.isnan(distances), 0.5, 1.0 / (1.0 + distances / 2.0))
+        popularity = np.log1p(reviews) / np.log1p(max(reviews.max(), 1.0))
+        order = np.argsort(-(0.5 * quality + 0.3 * proximity + 0.2 * popularity), kind="stable")
+
+    ranked = []
+    for i in order[:limit]:
+        place = dict(places[i])
+        place["distanceKm"] = None if np.isnan(distances[i]) else round(float(distances[i]), 1)
+        ranked.append(place)
+    return ranked
@@ -0,0 +1,115 @@
+"""
+Compact, conditional and compressed JSON responses.
+
+Bodies are serialized with orjson when it is installed. Suggestion
+responses carry a weak ETag derived from their content, so a client or CDN
+that sends it back in If-None-Match on a GET gets an empty 304 instead of
+the same list again. Larger bodies are brotli- or gzip-compressed according to
+Accept-Encoding (brotli only when the module is installed).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; the headers would cost more
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 512))
+
+
+def dumps(obj):
+    """Serialize obj to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class CompactJSONResponse(Response):
+    """Default response class: the same JSON, produced by orjson when available."""
+
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+def etag_for(obj):
+    return 'W/"' + hashlib.blake2b(dumps(obj), digest_size=12).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same content
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding):
+    """Pick br, gzip or None from an Accept-Encoding header, honouring q=0."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def conditional_json(request, body, cache_control, validator=None, status_code=200):
+    """JSON response with an ETag, 304 handling and negotiated compression.
+
+    The ETag is computed from validator (default: the whole body), so
+    per-response fields such as cursors or timings can be left out of it.
+    Only GET and HEAD answer If-None-Match with 304 (RFC 9110 13.1.2); other
+    methods have already done their work and just carry the ETag.
+    """
+    etag = etag_for(body if validator is None else validator)
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if request.method in ("GET", "HEAD") and _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    content = dumps(body)
+    encoding = choose_encoding(request.headers.get("accept-encoding")) if len(content) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        content = compress(content, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,190 @@
+"""
+Non-blocking scrape scheduler.
+
+Jobs are queued per client and a fixed set of asyncio workers serves the
+clients round-robin, so one chatty client cannot starve the others. When
+the queue is full, submit() fails fast with QueueFull instead of letting
+requests pile up until they time out.
+
+Background work (prefetching) goes in a separate low-priority lane that is
+only served when no client job is waiting, and never by the last idle
+worker, so it cannot delay live traffic. A single-worker scheduler has no
+worker to spare and refuses background jobs outright.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+
+
+class QueueFull(Exception):
+    """Raised when a job cannot be queued; carries a Retry-After hint."""
+
+    def __init__(self, message, retry_after, per_client=False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.per_client = per_client
+
+
+class _Job:
+    def __init__(self, client_id, factory):
+        self.client_id = client_id
+        self.factory = factory
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class ScrapeScheduler:
+    """Bounded asyncio job queue with per-client fairness."""
+
+    def __init__(self, workers=2, max_queue=20, max_per_client=4):
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.max_per_client = max(1, max_per_client)
+        # Workers background jobs may occupy; the last one is kept for client jobs
+        self.low_slots = self.workers - 1
+
+        self._queues = OrderedDict()
+        self._depth = 0
+        self._low = deque()
+        self._wakeup = None
+        self._tasks = []
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self._service_total = 0.0
+        self._last_wait = 0.0
+
+    @classmethod
+    def from_env(cls, default_workers=2):
+        return cls(
+            workers=int(os.environ.get("SCRAPE_WORKERS", default_workers)),
+            max_queue=int(os.environ.get("SCRAPE_MAX_QUEUE", 20)),
+            max_per_client=int(os.environ.get("SCRAPE_MAX_PER_CLIENT", 4)),
+        )
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for queue in self._queues.values():
+            for job in queue:
+                if not job.future.done():
+                    job.future.cancel()
+        for job in self._low:
+            if not job.future.done():
+                job.future.cancel()
+        self._queues.clear()
+        self._low.clear()
+        self._depth = 0
+
+    def _retry_after(self):
+        served = self.completed + self.failed
+        avg_service = self._service_total / served if served else 10.0
+        return max(1, int(avg_service * (self._depth + 1) / self.workers))
+
+    async def submit(self, client_id, factory, low_priority=False):
+        """Queue factory() for a worker and wait for its result."""
+        if low_priority:
+            if not self.low_slots:
+                raise QueueFull("No worker to spare for background jobs", self._retry_after())
+            if len(self._low) >= self.workers:
+                self.rejected += 1
+                raise QueueFull("Background queue is full", self._retry_after())
+            job = _Job(client_id, factory)
+            self._low.append(job)
+            self._wakeup.set()
+            return await job.future
+
+        queue = self._queues.get(client_id)
+        if self._depth >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull("Scrape queue is full", self._retry_after())
+        if queue is not None and len(queue) >= self.max_per_client:
+            self.rejected += 1
+            raise QueueFull("Too many pending scrapes for this client", self._retry_after(), per_client=True)
+
+        job = _Job(client_id, factory)
+        if queue is None:
+            queue = self._queues[client_id] = deque()
+        queue.append(job)
+        self._depth += 1
+        self._wakeup.set()
+        return await job.future
+
+    def _next_job(self):
+        # Take the head of the first client's queue, then rotate that client
+        # to the back so every client gets one job per round.
+        while self._queues:
+            client_id, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            self._depth -= 1
+            if queue:
+                self._queues.move_to_end(client_id)
+            else:
+                del self._queues[client_id]
+            if not job.future.done():
+                return job
+        # Keep one worker free for client jobs that may arrive meanwhile
+        while self._low and self.running < self.low_slots:
+            job = self._low.popleft()
+            if not job.future.done():
+                return job
+        return None
+
+    async def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            started = time.monotonic()
+            self._last_wait = started - job.enqueued_at
+            self._wait_total += self._last_wait
+            self.running += 1
+            try:
+                result = await job.factory()
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self.completed += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self.running -= 1
+                self._service_total += time.monotonic() - started
+
+    def stats(self):
+        served = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "queueDepth": self._depth,
+            "lowPriorityDepth": len(self._low),
+            "maxQueue": self.max_queue,
+            "running": self.running,
+            "clientsWaiting": len(self._queues),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "lastWaitMs": round(self._last_wait * 1000),
+            "avgWaitMs": round(self._wait_total / served * 1000) if served else 0,
+            "avgServiceMs": round(self._service_total / served * 1000) if served else 0,
+        }
@@ -6,143 +6,601 @@ Google Maps Place Scraper using Playwright.
 import sys
 import json
 import argparse
-import math
-from playwright.sync_api import sync_playwright
+import asyncio
+import os
+import re
+import time
+from contextlib import contextmanager
 
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
 
-def haversine_km(lat1, lon1, lat2, lon2):
-    R = 6371
-    d_lat = math.radians(lat2 - lat1)
-    d_lon = math.radians(lon2 - lon1)
-    a = (math.sin(d_lat / 2) ** 2 +
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-         math.sin(d_lon / 2) ** 2)
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+import blocking
+import metrics
+import ranking
+import snapshot
+from engine import ScrapingEngine
 
 
-def scrape_google_maps(query, city, user_lat=None, user_lng=None, max_results=10, sort_mode='distance', mood=''):
-    if sort_mode == 'stars':
+def place_key(place):
+    """Stable identity of a place: its Maps id, else its coordinates, else its name."""
+    if place.get("placeId"):
+        return place["placeId"]
+    if place.get("lat") is not None and place.get("lng") is not None:
+        return f"{place['lat']:.6f},{place['lng']:.6f}"
+    return "name:" + " ".join((place.get("name") or "").lower().split())
+
+
+def parse_place_id(href):
+    """Stable id for a Maps place link: the ChIJ place id, else the feature id."""
+    match = re.search(r"!19s([^!?&]+)", href) or re.search(r"!1s(0x[0-9a-f]+:0x[0-9a-f]+)", href)
+    return match.group(1) if match else None
+
+
+CARD_SELECTOR = 'div[role="feed"] > div > div > a[href*="/maps/place/"]'
+FEED_SELECTOR = 'div[role="feed"]'
+# Maps skips the feed and opens the place itself when a search has one match
+PLACE_SELECTOR = 'div[role="main"] h1'
+PLACE_URL_MARKER = "/maps/place/"
+CONSENT_SELECTOR = 'button:has-text("Accept all")'
+
+# Upstream failures a scrape can end in, recorded as ScrapeReport.failure:
+# a consent wall that would not go away, a captcha / "unusual traffic" page,
+# no result feed, a feed without a single usable card, or a failed navigation
+FAILURE_KINDS = ("consent", "captcha", "no_feed", "no_cards", "navigation")
+# The kinds that mean upstream is refusing us. A missing or empty feed is
+# just as often a search Maps has nothing for, so it does not count as one
+UPSTREAM_BLOCKS = ("consent", "captcha", "navigation")
+CAPTCHA_URL_MARKERS = ("/sorry/", "recaptcha")
+CONSENT_URL_MARKERS = ("consent.google.", "/consent")
+
+# Where Maps searches go; point at a local fixture server for benchmarks
+MAPS_BASE_URL = os.environ.get("SCRAPER_MAPS_BASE_URL", "https://www.google.com")
+
+# Overall cap (seconds) on one scrape's navigation, waiting and scrolling
+DEFAULT_DEADLINE = float(os.environ.get("SCRAPER_DEADLINE", 20))
+
+# The deadline is a budget split across stages: navigation and the first
+# feed wait may each spend only this share of what is left, and scrolling
+# stops early enough to leave EXTRACT_RESERVE of the whole budget to extract
+GOTO_SHARE = 0.5
+FEED_WAIT_SHARE = 0.6
+EXTRACT_RESERVE = 0.15
+
+# Collects label, href and visible text lines of every result card in the feed
+EXTRACT_CARDS_JS = """
+([selector, start]) => Array.from(document.querySelectorAll(selector)).slice(start).map(
+    link => ({
+        label: link.getAttribute('aria-label') || '',
+        href: link.getAttribute('href') || '',
+        lines: (link.parentElement ? link.parentElement.innerText : '').split('\\n'),
+    })
+)
+"""
+
+# The place a single-match search opened, in the same shape as a feed card
+EXTRACT_PLACE_PAGE_JS = """
+selector => {
+    const heading = document.querySelector(selector);
+    const main = document.querySelector('div[role="main"]');
+    return {
+        label: heading ? heading.innerText : '',
+        href: location.href,
+        lines: (main ? main.innerText : '').split('\\n'),
+    };
+}
+"""
+
+# Number of distinct places currently rendered in the feed
+COUNT_CARDS_JS = """
+selector => new Set(Array.from(document.querySelectorAll(selector), a => a.getAttribute('aria-label'))).size
+"""
+
+# True once the feed holds more distinct places than the given count
+CARDS_GREW_JS = """
+([selector, count]) => new Set(Array.from(document.querySelectorAll(selector), a => a.getAttribute('aria-label'))).size > count
+"""
+
+
+# Bulk mode: cards not yet extracted are those without this attribute
+BULK_MARK = "data-lg-seen"
+
+# Like EXTRACT_CARDS_JS, but only for cards appended since the last call.
+# Extracted cards are marked and, with prune set, emptied down to a spacer of
+# the same height so the DOM stays small while Maps keeps loading on scroll.
+EXTRACT_NEW_CARDS_JS = """
+([selector, mark, prune]) => {
+    const links = Array.from(document.querySelectorAll(selector)).filter(a => !a.hasAttribute(mark));
+    const cards = links.map(link => ({
+        label: link.getAttribute('aria-label') || '',
+        href: link.getAttribute('href') || '',
+        lines: (link.parentElement ? link.parentElement.innerText : '').split('\\n'),
+    }));
+    for (const link of links) {
+        link.setAttribute(mark, '');
+        const item = link.parentElement && link.parentElement.parentElement;
+        if (prune && item && item.parentElement && item.parentElement.matches('div[role="feed"]')) {
+            item.style.height = item.offsetHeight + 'px';
+            item.replaceChildren();
+        }
+    }
+    return cards;
+}
+"""
+
+# Shown by Maps once the feed has nothing more to load
+END_OF_LIST_TEXT = "You've reached the end of the list"
+
+# True when the feed has unextracted cards or has reached its end
+BULK_PROGRESS_JS = """
+([selector, mark, endText]) =>
+    Array.from(document.querySelectorAll(selector)).some(a => !a.hasAttribute(mark))
+    || document.querySelector('div[role="feed"]').innerText.includes(endText)
+"""
+
+# Seconds a bulk scrape may run, and scrolls without new cards before giving up
+BULK_DEADLINE = float(os.environ.get("SCRAPER_BULK_DEADLINE", 300))
+BULK_MAX_STALLS = int(os.environ.get("SCRAPER_BULK_MAX_STALLS", 3))
+
+
+def _budget_ms(deadline_at, cap_ms, share=1.0):
+    """Milliseconds a wait may take: cap_ms, shrunk to `share` of what is left before deadline_at."""
+    # Playwright treats a timeout of 0 as "wait forever", so never go below 1 ms
+    return max(1, min(cap_ms, int((deadline_at - time.monotonic()) * share * 1000)))
+
+
+def _expired(deadline_at):
+    # A few ms of slack: a wait whose budget ran out returns just short of it
+    return time.monotonic() >= deadline_at - 0.01
+
+
+class ScrapeReport:
+    """What happened during one scrape: per-stage timings and upstream signals."""
+
+    def __init__(self):
+        self.timings = {}
+        self.network = None
+        self.consent = False
+        self.results = 0
+        self.parse_failures = 0
+        # True when the deadline cut a stage short, so results may be incomplete
+        self.partial = False
+        # One of FAILURE_KINDS when upstream, not the budget, stopped the scrape
+        self.failure = None
+        # Set when iter_places(park=True) leaves its page open for later paging
+        self.session = None
+
+    def record(self, name, seconds):
+        # Stages entered repeatedly (bulk scrolling) add up
+        self.timings[name] = round(self.timings.get(name, 0) + seconds * 1000, 1)
+        metrics.STAGE_SECONDS.observe(seconds, stage=name)
+
+    def fail(self, kind):
+        # The first failure is the cause; later ones are consequences
+        if self.failure is None:
+            self.failure = kind
+            metrics.UPSTREAM_FAILURES.inc(kind=kind)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def as_dict(self):
+        return {
+            "timings": dict(self.timings),
+            "network": self.network.as_dict() if self.network else None,
+            "consent": self.consent,
+            "results": self.results,
+            "parseFailures": self.parse_failures,
+            "partial": self.partial,
+            "failure": self.failure,
+        }
+
+
+def parse_card(card, city):
+    """Turn one extracted card ({label, href, lines}) into a place dict.
+
+    distanceKm is left empty; ranking.rank() fills it in for the whole pool.
+    """
+    name = (card.get("label") or "").strip()
+    href = card.get("href") or ""
+    if not name:
+        return None
+
+    lat, lng = None, None
+    if "!3d" in href and "!4d" in href:
+        try:
+            lat = float(href.split("!3d")[1].split("!")[0])
+            lng = float(href.split("!4d")[1].split("!")[0])
+        except ValueError:
+            pass
+
+    rating = None
+    reviews = None
+    address = ""
+
+    lines = [l.strip() for l in card.get("lines") or [] if l.strip()]
+    for line in lines:
+        if rating is None and len(line) <= 4:
+            try:
+                val = float(line)
+                if 1.0 <= val <= 5.0:
+                    rating = val
+            except ValueError:
+                pass
+        if "(" in line and ")" in line and rating is not None and reviews is None:
+            try:
+                reviews = int(line.strip("()").replace(",", "").replace(".", ""))
+            except ValueError:
+                pass
+        if not address and ("·" in line or "," in line) and len(line) > 10:
+            address = line.split("·")[-1].strip() if "·" in line else line
+
+    return {
+        "placeId": parse_place_id(href),
+        "name": name,
+        "address": address or city,
+        "rating": rating,
+        "reviews": reviews,
+        "lat": lat,
+        "lng": lng,
+        "distanceKm": None,
+    }
+
+
+def search_url(query, city, user_lat=None, user_lng=None, rating_sort=False, base_url=None):
+    base_url = (base_url or MAPS_BASE_URL).rstrip("/")
+    if rating_sort:
         search_term = f"best {query} in {city}"
-        url = f"https://www.google.com/maps/search/{search_term.replace(' ', '+')}"
-    elif user_lat and user_lng:
-        url = f"https://www.google.com/maps/search/{query.replace(' ', '+')}/@{user_lat},{user_lng},14z"
-    else:
-        search_term = f"{query} in {city}"
-        url = f"https://www.google.com/maps/search/{search_term.replace(' ', '+')}"
-
-    results = []
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(
-            locale="en-US",
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            geolocation={"latitude": user_lat, "longitude": user_lng} if user_lat and user_lng else None,
-            permissions=["geolocation"] if user_lat and user_lng else [],
-        )
-        page = context.new_page()
+        return f"{base_url}/maps/search/{search_term.replace(' ', '+')}"
+    if user_lat and user_lng:
+        return f"{base_url}/maps/search/{query.replace(' ', '+')}/@{user_lat},{user_lng},14z"
+    search_term = f"{query} in {city}"
+    return f"{base_url}/maps/search/{search_term.replace(' ', '+')}"
+
 
+def _blocked_page(url):
+    """Failure kind implied by where Maps redirected us, if any."""
+    url = (url or "").lower()
+    if any(marker in url for marker in CAPTCHA_URL_MARKERS):
+        return "captcha"
+    if any(marker in url for marker in CONSENT_URL_MARKERS):
+        return "consent"
+    return None
+
+
+def _on_place_page(page):
+    return PLACE_URL_MARKER in (page.url or "")
+
+
+async def place_page(page, city, report):
+    """The place a single-match search opened, parsed like a feed card, or None."""
+    with report.stage("extract"):
+        card = await page.evaluate(EXTRACT_PLACE_PAGE_JS, PLACE_SELECTOR)
+    place = parse_card(card, city)
+    if place is None:
+        report.parse_failures += 1
+        metrics.PARSE_FAILURES.inc()
+        return None
+    report.results += 1
+    metrics.RESULTS.inc()
+    return place
+
+
+async def open_feed(page, url, deadline_at, report):
+    """Navigate to a search, get past any consent wall and return the feed locator.
+
+    Returns None when there is no feed: with the reason on report.failure,
+    with report.partial when the budget ran out first, or with neither when
+    Maps went straight to the only matching place (see place_page()).
+    """
+    with report.stage("goto"):
         try:
-            page.goto(url, wait_until="domcontentloaded", timeout=20000)
-            page.wait_for_timeout(3000)
+            await page.goto(url, wait_until="domcontentloaded", timeout=_budget_ms(deadline_at, 20000, GOTO_SHARE))
+        except PlaywrightError as e:
+            if isinstance(e, PlaywrightTimeoutError) and _expired(deadline_at):
+                report.partial = True
+            else:
+                report.fail("navigation")
+            print(json.dumps({"error": f"navigation failed: {e}"}), file=sys.stderr)
+            return None
 
-            # Consent dismiss
+    blocked = _blocked_page(page.url)
+    if blocked == "captcha":
+        report.fail("captcha")
+        return None
+
+    with report.stage("feed_wait"):
+        # Wait for whichever comes first: the result feed, a consent wall or
+        # the single place a one-match search opens
+        feed = page.locator(FEED_SELECTOR).first
+        consent = page.locator(CONSENT_SELECTOR).first
+        place = page.locator(PLACE_SELECTOR).first
+        try:
+            await feed.or_(consent).or_(place).first.wait_for(timeout=_budget_ms(deadline_at, 10000, FEED_WAIT_SHARE))
+        except PlaywrightTimeoutError:
+            pass
+        if _on_place_page(page):
+            return None
+
+        if await consent.is_visible():
+            report.consent = True
+            metrics.CONSENT_HITS.inc()
             try:
-                page.locator('button:has-text("Accept all")').first.click(timeout=1500)
-                page.wait_for_timeout(800)
-            except:
+                await consent.click(timeout=_budget_ms(deadline_at, 1500))
+            except PlaywrightTimeoutError:
+                # Judged below: the wall only matters if the feed never shows
+                pass
+
+        try:
+            await feed.wait_for(timeout=_budget_ms(deadline_at, 8000))
+        except PlaywrightTimeoutError:
+            # No feed: Maps showed a single place, nothing at all, a block
+            # page, or the budget ran out
+            metrics.TIMEOUTS.inc(stage="feed_wait")
+            blocked = _blocked_page(page.url)
+            if blocked:
+                report.fail(blocked)
+            elif _on_place_page(page):
+                # A single match that opened while we waited for the feed
                 pass
+            elif await consent.is_visible():
+                report.fail("consent")
+            elif _expired(deadline_at):
+                report.partial = True
+            else:
+                report.fail("no_feed")
+            return None
+    return feed
+
+
+class FeedSession:
+    """An open Maps results feed that can keep scrolling past the places already taken."""
+
+    def __init__(self, page, feed, city, user_lat=None, user_lng=None, rating_sort=False, report=None):
+        self.page = page
+        self.feed = feed
+        self.city = city
+        self.user_lat = user_lat
+        self.user_lng = user_lng
+        self.rating_sort = rating_sort
+        self.report = report or ScrapeReport()
+        self.offset = 0
+        self.seen = set()
+
+    async def count(self):
+        """Distinct places currently rendered in the feed."""
+        return await self.page.evaluate(COUNT_CARDS_JS, CARD_SELECTOR)
+
+    async def scroll_once(self, loaded, deadline_at):
+        """Scroll to the bottom once; True if more than `loaded` places appeared before deadline_at."""
+        await self.feed.evaluate('el => el.scrollTop = el.scrollHeight')
+        try:
+            await self.page.wait_for_function(
+                CARDS_GREW_JS, arg=[CARD_SELECTOR, loaded], timeout=_budget_ms(deadline_at, 2500)
+            )
+        except PlaywrightTimeoutError:
+            return False
+        return True
+
+    def _budget_cut(self, deadline_at):
+        # Stopped by the budget rather than by the end of the feed
+        if _expired(deadline_at):
+            self.report.partial = True
+            metrics.TIMEOUTS.inc(stage="scroll")
+
+    async def scroll(self, wanted, deadline_at):
+        """Scroll until `wanted` distinct places are loaded, the feed stops growing or deadline_at."""
+        loaded = await self.count()
+        while loaded < wanted and time.monotonic() < deadline_at:
+            if not await self.scroll_once(loaded, deadline_at):
+                break
+            loaded = await self.count()
+        if loaded < wanted:
+            self._budget_cut(deadline_at)
+        return loaded
+
+    async def extract(self):
+        # Every card not taken yet, in one round trip; parsing happens in Python
+        return await self.page.evaluate(EXTRACT_CARDS_JS, [CARD_SELECTOR, self.offset])
+
+    def take(self, cards, count):
+        """Parse cards (as extracted from the current offset) into at most `count` new places."""
+        places = []
+        for card in cards:
+            if len(places) >= count:
+                break
+            self.offset += 1
+
+            place = parse_card(card, self.city)
+            if place is None:
+                self.report.parse_failures += 1
+                metrics.PARSE_FAILURES.inc()
+                continue
+            if place["name"] in self.seen:
+                continue
+            if self.rating_sort and place["rating"] is None:
+                continue
+
+            self.seen.add(place["name"])
+            places.append(place)
+            self.report.results += 1
+            metrics.RESULTS.inc()
+        return places
+
+    async def more(self, count, deadline=None):
+        """Scroll further and return up to `count` places not returned before."""
+        budget = deadline or DEFAULT_DEADLINE
+        deadline_at = time.monotonic() + budget * (1 - EXTRACT_RESERVE)
+        await self.scroll(self.offset + count * 2, deadline_at)
+        return self.take(await self.extract(), count)
 
-            # Wait for feed
+    async def close(self):
+        await self.page.close()
+
+
+async def iter_places(context, query, city, user_lat=None, user_lng=None, max_results=10, sort_mode='distance', mood='', deadline=None, report=None, base_url=None,
+                      snapshot_dir=None, snapshot_meta=None, park=False):
+    """Yield each place as soon as it is parsed from the result feed.
+
+    Places on the feed's first render are yielded before the first scroll,
+    then each scroll's newly appended cards, until max_results are found,
+    the feed stops growing or the budget runs out.
+
+    deadline (seconds) is the budget for the whole scrape; each stage shrinks
+    its waits to fit what is left. Stage timings and upstream signals,
+    including whether the budget cut the scrape short (report.partial), are
+    recorded on report (a ScrapeReport). When snapshot_dir (or SCRAPER_SNAPSHOT_DIR) is set, the feed HTML is saved
+    there for offline re-parsing with snapshot.py. With park=True the page is
+    left open and handed over as report.session (a FeedSession) so a later
+    request can keep scrolling; the caller must close it.
+    """
+    snapshot_dir = snapshot_dir or snapshot.SNAPSHOT_DIR
+    budget = deadline or DEFAULT_DEADLINE
+    deadline_at = time.monotonic() + budget
+    report = report or ScrapeReport()
+    rating_sort = ranking.resolve_mode(sort_mode) in ("rating", "bayesian")
+    url = search_url(query, city, user_lat, user_lng, rating_sort, base_url)
+
+    session = None
+    page = await context.new_page()
+    report.network = await blocking.install(page)
+
+    try:
+        feed = await open_feed(page, url, deadline_at, report)
+        if feed is None:
+            if report.failure is None and _on_place_page(page):
+                place = await place_page(page, city, report)
+                if place is not None:
+                    yield place
+            return
+
+        session = FeedSession(page, feed, city, user_lat, user_lng, rating_sort, report)
+        scroll_deadline = deadline_at - budget * EXTRACT_RESERVE
+        taken = 0
+        while True:
+            # The first render's cards go out before any scrolling, then
+            # whatever each scroll appends
+            with report.stage("extract"):
+                cards = await session.extract()
+            for place in session.take(cards, max_results - taken):
+                taken += 1
+                yield place
+            if taken >= max_results:
+                break
+            with report.stage("scroll"):
+                grew = time.monotonic() < scroll_deadline and await session.scroll_once(await session.count(), scroll_deadline)
+            if not grew:
+                session._budget_cut(scroll_deadline)
+                break
+
+        if not taken and not report.partial:
+            report.fail("no_cards")
+
+        if snapshot_dir:
             try:
-                page.wait_for_selector('div[role="feed"]', timeout=8000)
-            except:
-                page.wait_for_timeout(1500)
+                feed_html = await feed.evaluate("el => el.outerHTML")
+                meta = {"query": query, "city": city, "url": url, "lat": user_lat, "lng": user_lng,
+                        "sortMode": sort_mode, "savedAt": time.time(), **(snapshot_meta or {})}
+                await asyncio.to_thread(snapshot.save, snapshot_dir, feed_html, meta)
+            except Exception as e:
+                print(json.dumps({"error": f"snapshot failed: {e}"}), file=sys.stderr)
 
-            # Scroll to load results
-            feed = page.locator('div[role="feed"]').first
-            for _ in range(3):
-                try:
-                    feed.evaluate('el => el.scrollTop = el.scrollHeight')
-                    page.wait_for_timeout(1000)
-                except:
-                    break
+    except Exception as e:
+        if isinstance(e, PlaywrightTimeoutError) and _expired(deadline_at):
+            report.partial = True
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+    finally:
+        if park and session is not None:
+            report.session = session
+        else:
+            await page.close()
+        print(json.dumps({"query": query, "city": city, **report.as_dict()}), file=sys.stderr)
 
-            # Extract places
-            place_links = page.locator('div[role="feed"] > div > div > a[href*="/maps/place/"]').all()
 
-            for link in place_links[:max_results * 2]:
-                if len(results) >= max_results:
-                    break
+async def iter_bulk(context, query, city, user_lat=None, user_lng=None, limit=500, deadline=None, report=None, base_url=None, prune=True):
+    """Yield up to `limit` distinct places, scrolling until Maps reports the end of the list.
 
-                try:
-                    aria_label = link.get_attribute("aria-label") or ""
-                    href = link.get_attribute("href") or ""
-                    if not aria_label:
-                        continue
-
-                    name = aria_label.strip()
-                    if any(r["name"] == name for r in results):
-                        continue
-
-                    lat, lng = None, None
-                    if "!3d" in href and "!4d" in href:
-                        try:
-                            lat = float(href.split("!3d")[1].split("!")[0])
-                            lng = float(href.split("!4d")[1].split("!")[0])
-                        except:
-                            pass
-
-                    parent = link.locator("..").first
-                    rating = None
-                    reviews = None
-                    address = ""
-
-                    try:
-                        lines = [l.strip() for l in parent.inner_text(timeout=1500).split("\n") if l.strip()]
-                        for line in lines:
-                            if rating is None and len(line) <= 4:
-                                try:
-                                    val = float(line)
-                                    if 1.0 <= val <= 5.0:
-                                        rating = val
-                                except:
-                                    pass
-                            if "(" in line and ")" in line and rating is not None and reviews is None:
-                                try:
-                                    reviews = int(line.strip("()").replace(",", "").replace(".", ""))
-                                except:
-                                    pass
-                            if not address and ("·" in line or "," in line) and len(line) > 10:
-                                address = line.split("·")[-1].strip() if "·" in line else line
-                    except:
-                        pass
-
-                    if sort_mode == 'stars' and rating is None:
-                        continue
-
-                    distance_km = None
-                    if lat and lng and user_lat and user_lng:
-                        distance_km = round(haversine_km(user_lat, user_lng, lat, lng), 1)
-
-                    results.append({
-                        "name": name,
-                        "address": address or city,
-                        "rating": rating,
-                        "reviews": reviews,
-                        "lat": lat,
-                        "lng": lng,
-                        "distanceKm": distance_km,
-                    })
-                except:
+    Meant for seeding datasets with hundreds of places per search. Each
+    scroll extracts only the cards appended since the previous one, places
+    are deduplicated on place_key() in a set, and nothing but those keys is
+    kept, so memory stays flat however long the feed gets.
+    """
+    deadline_at = time.monotonic() + (deadline or BULK_DEADLINE)
+    report = report or ScrapeReport()
+    url = search_url(query, city, user_lat, user_lng, base_url=base_url)
+    seen = set()
+    stalls = 0
+
+    page = await context.new_page()
+    report.network = await blocking.install(page)
+
+    try:
+        feed = await open_feed(page, url, deadline_at, report)
+        if feed is None:
+            if report.failure is None and _on_place_page(page):
+                place = await place_page(page, city, report)
+                if place is not None:
+                    yield place
+            return
+
+        while len(seen) < limit:
+            with report.stage("extract"):
+                cards = await page.evaluate(EXTRACT_NEW_CARDS_JS, [CARD_SELECTOR, BULK_MARK, prune])
+            for card in cards:
+                place = parse_card(card, city)
+                if place is None:
+                    report.parse_failures += 1
+                    metrics.PARSE_FAILURES.inc()
+                    continue
+                key = place_key(place)
+                if key in seen:
                     continue
+                seen.add(key)
+                report.results += 1
+                metrics.RESULTS.inc()
+                yield place
+                if len(seen) >= limit:
+                    return
 
-        except Exception as e:
-            print(json.dumps({"error": str(e)}), file=sys.stderr)
-        finally:
-            browser.close()
+            if await feed.evaluate("(el, text) => el.innerText.includes(text)", END_OF_LIST_TEXT):
+                break
+            if time.monotonic() >= deadline_at:
+                metrics.TIMEOUTS.inc(stage="bulk")
+                break
 
-    return results
+            with report.stage("scroll"):
+                await feed.evaluate('el => el.scrollTop = el.scrollHeight')
+                try:
+                    await page.wait_for_function(
+                        BULK_PROGRESS_JS, arg=[CARD_SELECTOR, BULK_MARK, END_OF_LIST_TEXT],
+                        timeout=_budget_ms(deadline_at, 5000),
+                    )
+                    stalls = 0
+                except PlaywrightTimeoutError:
+                    # Maps sometimes needs a nudge; give up after a few dry scrolls
+                    stalls += 1
+                    if stalls >= BULK_MAX_STALLS:
+                        break
+
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+    finally:
+        await page.close()
+        print(json.dumps({"query": query, "city": city, "bulk": True, **report.as_dict()}), file=sys.stderr)
+
+
+async def scrape_google_maps(context, query, city, user_lat=None, user_lng=None, max_results=10, sort_mode='distance', mood='', candidates=None, base_url=None):
+    """Scrape a candidate pool (3x max_results by default) and return its top places for sort_mode."""
+    pool = [
+        place async for place in iter_places(
+            context, query, city, user_lat, user_lng, candidates or max_results * 3, sort_mode, mood, base_url=base_url
+        )
+    ]
+    return ranking.rank(pool, sort_mode, user_lat, user_lng, max_results)
 
 
 def main():
@@ -152,14 +610,66 @@ def main():
     parser.add_argument("--lat", type=float, default=None)
     parser.add_argument("--lng", type=float, default=None)
     parser.add_argument("--max", type=int, default=10)
-    parser.add_argument("--sort", default="distance", choices=["distance", "stars"])
+    parser.add_argument("--sort", default="distance", choices=list(ranking.SORT_MODES) + list(ranking.ALIASES))
     parser.add_argument("--mood", type=str, default="")
+    parser.add_argument("--store", type=str, default=None, help="SQLite place store to upsert results into")
+    parser.add_argument("--base-url", type=str, default=None, help="Maps origin to scrape (default: SCRAPER_MAPS_BASE_URL or Google)")
+    parser.add_argument("--bulk", action="store_true", help="Scroll to the end of the list for up to --max places, streaming JSONL")
+    parser.add_argument("--out", type=str, default=None, help="With --bulk, write JSONL here instead of stdout")
     args = parser.parse_args()
 
+    if args.bulk:
+        asyncio.run(_run_bulk(args))
+        return
+
     # The query is already combined with mood in main.py, but we pass it anyway for compatibility
-    places = scrape_google_maps(args.query, args.city, args.lat, args.lng, args.max, args.sort, args.mood)
+    places = asyncio.run(_run_once(args))
+    if args.store:
+        from place_store import PlaceStore
+        PlaceStore(args.store).upsert(places, args.city, args.query)
     print(json.dumps({"suggestions": places}, ensure_ascii=False))
 
 
+async def _run_once(args):
+    engine = ScrapingEngine(browsers=1, contexts_per_browser=1)
+    await engine.start()
+    try:
+        async with engine.lease(args.lat, args.lng) as context:
+            return await scrape_google_maps(
+                context, args.query, args.city, args.lat, args.lng, args.max, args.sort, args.mood, base_url=args.base_url
+            )
+    finally:
+        await engine.stop()
+
+
+async def _run_bulk(args, store_batch=100):
+    store = None
+    if args.store:
+        from place_store import PlaceStore
+        store = PlaceStore(args.store)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    pending = []
+    engine = ScrapingEngine(browsers=1, contexts_per_browser=1)
+    await engine.start()
+    try:
+        async with engine.lease(args.lat, args.lng) as context:
+            async for place in iter_bulk(context, args.query, args.city, args.lat, args.lng, args.max, base_url=args.base_url):
+                out.write(json.dumps(place, ensure_ascii=False) + "\n")
+                out.flush()
+                if store:
+                    pending.append(place)
+                    if len(pending) >= store_batch:
+                        store.upsert(pending, args.city, args.query)
+                        pending = []
+    finally:
+        await engine.stop()
+        if store:
+            if pending:
+                store.upsert(pending, args.city, args.query)
+            store.close()
+        if args.out:
+            out.close()
+
+
 if __name__ == "__main__":
     main()
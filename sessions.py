@@ -0,0 +1,157 @@
+"""
+"Load more" state: parked result pages and pagination cursors.
+
+A scrape that filled its candidate pool can leave its Maps page open,
+parked under the request's cache key together with the engine slot that
+owns it, so a follow-up request keeps scrolling the same feed instead of
+repeating navigation, consent and scrolling. Parked pages hold browser
+memory, so they are capped and closed after `idle_ttl` seconds unused.
+
+Cursors are opaque ids handed to clients; each remembers the request, the
+candidate pool extracted so far and which places were already returned.
+"""
+
+import asyncio
+import os
+import secrets
+import time
+from collections import OrderedDict
+
+
+class ParkedPages:
+    """Open FeedSessions keyed by cache key, each pinning one engine slot."""
+
+    def __init__(self, release, max_pages=1, idle_ttl=60.0):
+        # release(slot) hands the slot (and closes its pages) back to the engine
+        self._release = release
+        self.max_pages = max(0, max_pages)
+        self.idle_ttl = idle_ttl
+        self._pages = OrderedDict()
+        self._sweeper = None
+        self.parked = 0
+        self.resumed = 0
+        self.evicted = 0
+
+    @classmethod
+    def from_env(cls, release, capacity):
+        # Always leave at least one context free for fresh scrapes
+        max_pages = int(os.environ.get("PARKED_PAGES_MAX", 1))
+        return cls(
+            release,
+            max_pages=min(max_pages, capacity - 1),
+            idle_ttl=float(os.environ.get("PARKED_PAGE_IDLE", 60)),
+        )
+
+    @property
+    def enabled(self):
+        return self.max_pages > 0
+
+    def __contains__(self, key):
+        return key in self._pages
+
+    def __len__(self):
+        return len(self._pages)
+
+    async def start(self):
+        if self._sweeper is None and self.enabled:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        while self._pages:
+            await self.evict_oldest()
+
+    async def park(self, key, session, slot):
+        """Keep session open for later paging, evicting the oldest if full."""
+        if not self.enabled or key in self._pages:
+            await self._close(session, slot)
+            return
+        while len(self._pages) >= self.max_pages:
+            await self.evict_oldest()
+        self._pages[key] = (session, slot, time.monotonic())
+        self.parked += 1
+
+    def take(self, key):
+        """Remove and return (session, slot) for key, or None."""
+        entry = self._pages.pop(key, None)
+        if entry is None:
+            return None
+        self.resumed += 1
+        return entry[0], entry[1]
+
+    async def evict_oldest(self):
+        if not self._pages:
+            return
+        _, (session, slot, _) = self._pages.popitem(last=False)
+        self.evicted += 1
+        await self._close(session, slot)
+
+    async def _close(self, session, slot):
+        try:
+            await session.close()
+        except Exception:
+            pass
+        await self._release(slot)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_ttl / 4))
+            now = time.monotonic()
+            # Oldest first, since park() appends
+            while self._pages:
+                _, (_, _, parked_at) = next(iter(self._pages.items()))
+                if now - parked_at < self.idle_ttl:
+                    break
+                await self.evict_oldest()
+
+    def stats(self):
+        return {
+            "parked": len(self._pages),
+            "maxPages": self.max_pages,
+            "idleTtl": self.idle_ttl,
+            "totalParked": self.parked,
+            "resumed": self.resumed,
+            "evicted": self.evicted,
+        }
+
+
+class Cursors:
+    """Bounded, expiring map of cursor id -> pagination state."""
+
+    def __init__(self, max_entries=1000, ttl=600.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_entries=int(os.environ.get("CURSOR_MAX_ENTRIES", 1000)),
+            ttl=float(os.environ.get("CURSOR_TTL", 600)),
+        )
+
+    def create(self, state):
+        cursor = secrets.token_urlsafe(12)
+        self._entries[cursor] = (state, time.monotonic())
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return cursor
+
+    def get(self, cursor):
+        entry = self._entries.get(cursor)
+        if entry is None:
+            return None
+        state, created_at = entry
+        if time.monotonic() - created_at > self.ttl:
+            del self._entries[cursor]
+            return None
+        self._entries.move_to_end(cursor)
+        return state
+
+    def drop(self, cursor):
+        self._entries.pop(cursor, None)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,76 @@
+"""
+Single-flight coalescing for identical in-flight scrapes.
+
+The first caller for a key starts the work as its own task; concurrent
+callers with the same key await that task instead of starting another one.
+Callers wait through asyncio.shield, so a disconnecting client only stops
+waiting and never cancels the shared scrape for everyone else. A flight may
+carry a state object the leader fills in as it goes (such as a Progress), so
+callers can follow the work as it happens and one that stops waiting early
+can still use what has been produced so far.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key."""
+
+    def __init__(self):
+        self._inflight = {}
+        self.leaders = 0
+        self.joined = 0
+
+    def _finished(self, key, task):
+        if self._inflight.get(key, (None,))[0] is task:
+            del self._inflight[key]
+        # Mark the outcome as observed even if every waiter has gone away
+        if not task.cancelled():
+            task.exception()
+
+    def start(self, key, factory, state=None):
+        """(task, state) of the flight for key, starting factory() with state if none is running."""
+        flight = self._inflight.get(key)
+        if flight is None:
+            task = asyncio.create_task(factory())
+            flight = self._inflight[key] = (task, state)
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self.leaders += 1
+        else:
+            self.joined += 1
+        return flight
+
+    async def do(self, key, factory):
+        """Run factory() once per key at a time and share its result."""
+        task, _ = self.start(key, factory)
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            "inFlight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.joined,
+        }
+
+
+class Progress:
+    """Items a flight has produced so far, passed on to every subscribed caller."""
+
+    def __init__(self):
+        self.items = []
+        self._subscribers = []
+
+    def put(self, item):
+        self.items.append(item)
+        for fn in list(self._subscribers):
+            fn(item)
+
+    def subscribe(self, fn):
+        """Call fn with every item, starting with those produced before it joined."""
+        for item in self.items:
+            fn(item)
+        self._subscribers.append(fn)
+
+    def unsubscribe(self, fn):
+        if fn in self._subscribers:
+            self._subscribers.remove(fn)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Feed snapshots: save the result feed HTML of live scrapes and re-parse
+saved snapshots offline, in bulk, without launching Chromium.
+
+Offline parsing rebuilds the same {label, href, lines} cards the live
+EXTRACT_CARDS_JS returns and runs them through scraper.parse_card, so
+heuristic changes can be regression-tested on thousands of snapshots and
+the place store can be backfilled from them.
+
+    python snapshot.py reparse snapshots/ --out parsed.jsonl --store places.db
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4 import BeautifulSoup, NavigableString
+
+import canonical
+import scraper
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+META_PREFIX = "<!-- snapshot "
+
+# Elements that innerText puts on their own line
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "footer", "form",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p",
+    "pre", "section", "table", "tr", "ul",
+}
+
+# Where live scrapes save their feed HTML; unset disables saving
+SNAPSHOT_DIR = os.environ.get("SCRAPER_SNAPSHOT_DIR")
+
+
+def save(directory, feed_html, meta):
+    """Write one feed snapshot, with its metadata in a leading HTML comment."""
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha1(f"{meta.get('url')}{time.time()}".encode("utf-8")).hexdigest()[:10]
+    path = os.path.join(directory, f"{int(time.time())}-{digest}.html")
+    header = META_PREFIX + json.dumps(meta, ensure_ascii=False).replace("--", "\\u002d\\u002d") + " -->\n"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(header)
+        # A minimal document so the bench fixture server can replay it as a page
+        f.write(f"<!doctype html><html><head><meta charset=\"utf-8\"></head><body>{feed_html}</body></html>\n")
+    return path
+
+
+def read_meta(text):
+    if not text.startswith(META_PREFIX):
+        return {}
+    try:
+        return json.loads(text[len(META_PREFIX):text.index(" -->")])
+    except ValueError:
+        return {}
+
+
+def inner_text(element):
+    """Approximate the browser's innerText: inline text joined, blocks on new lines."""
+    parts = []
+
+    def walk(node):
+        for child in node.children:
+            if isinstance(child, NavigableString):
+                # Skip comments, doctypes and other NavigableString subclasses
+                if child.__class__ is NavigableString:
+                    parts.append(re.sub(r"\s+", " ", str(child)))
+            elif child.name in ("script", "style"):
+                continue
+            elif child.name == "br":
+                parts.append("\n")
+            elif child.name in BLOCK_TAGS:
+                parts.append("\n")
+                walk(child)
+                parts.append("\n")
+            else:
+                walk(child)
+
+    walk(element)
+    return "".join(parts)
+
+
+def extract_cards(html):
+    """Browserless equivalent of scraper.EXTRACT_CARDS_JS."""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    cards = []
+    for link in soup.select(scraper.CARD_SELECTOR):
+        parent = link.parent
+        cards.append({
+            "label": link.get("aria-label") or "",
+            "href": link.get("href") or "",
+            "lines": inner_text(parent).split("\n") if parent else [],
+        })
+    return cards
+
+
+def parse_snapshot(path):
+    """Parse one snapshot file into (path, meta, places, failures)."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    meta = read_meta(text)
+    city = meta.get("city", "")
+    places, seen, failures = [], set(), 0
+    for card in extract_cards(text):
+        place = scraper.parse_card(card, city)
+        if place is None:
+            failures += 1
+            continue
+        if place["name"] in seen:
+            continue
+        seen.add(place["name"])
+        places.append(place)
+    return path, meta, places, failures
+
+
+def iter_snapshot_paths(directory):
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.endswith(".html"):
+                yield os.path.join(root, name)
+
+
+def reparse(paths, workers=None, chunksize=16):
+    """Parse snapshots across a process pool, yielding results as they finish."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(parse_snapshot, paths, chunksize=chunksize)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("reparse", help="Re-extract places from saved snapshots")
+    cmd.add_argument("directory")
+    cmd.add_argument("--workers", type=int, default=None)
+    cmd.add_argument("--out", type=str, default=None, help="Write one JSON line per snapshot here")
+    cmd.add_argument("--store", type=str, default=None, help="SQLite place store to backfill")
+    args = parser.parse_args()
+
+    store = None
+    if args.store:
+        from place_store import PlaceStore
+        store = PlaceStore(args.store)
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    started = time.perf_counter()
+    files = places_total = failures_total = 0
+    try:
+        for path, meta, places, failures in reparse(list(iter_snapshot_paths(args.directory)), args.workers):
+            files += 1
+            places_total += len(places)
+            failures_total += failures
+            if out:
+                out.write(json.dumps({"path": path, "meta": meta, "places": places, "parseFailures": failures}, ensure_ascii=False) + "\n")
+            if store and places and meta.get("city"):
+                # Older snapshots carry the raw category and mood; both canonicalize the same way
+                q = canonical.canonicalize(meta["city"], meta.get("category") or meta.get("query", ""), meta.get("mood"))
+                store.upsert(places, meta["city"], q.query)
+    finally:
+        if out:
+            out.close()
+        if store:
+            store.close()
+
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "files": files,
+        "places": places_total,
+        "parseFailures": failures_total,
+        "seconds": round(elapsed, 2),
+        "filesPerSecond": round(files / elapsed, 1) if elapsed else None,
+        "parser": HTML_PARSER,
+    }), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,31 @@
 import React, { useState } from 'react';
 import { Plus, Sparkles, MapPin, X, Navigation, Check, Search, Loader, Star, Route } from 'lucide-react';
 
+// Reads the NDJSON stream from /api/scrape/stream, calling onPlace for every
+// place event, and resolves with the final summary ({ suggestions }).
+async function readPlaceStream(res, onPlace) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let summary = { suggestions: [] };
+
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const event = JSON.parse(line);
+            if (event.type === 'place') onPlace(event.place);
+            else if (event.type === 'done') summary = event;
+            else if (event.type === 'error') throw new Error(event.error);
+        }
+    }
+    return summary;
+}
+
 export default function SuggestionsScreen({ city, category, suggestions, onAdd, onStartSpin, t, userLocation }) {
     const [showManualAdd, setShowManualAdd] = useState(false);
     const [showSearch, setShowSearch] = useState(false);
@@ -11,6 +36,8 @@ export default function SuggestionsScreen({ city, category, suggestions, onAdd,
     const [selected, setSelected] = useState(new Set());
     const [lastSortBy, setLastSortBy] = useState(null);
     const [seenNames, setSeenNames] = useState([]);
+    const [cursor, setCursor] = useState(null);
+    const [isLoadingMore, setIsLoadingMore] = useState(false);
 
     const handleManualAdd = (e) => {
         e.preventDefault();
@@ -26,6 +53,7 @@ export default function SuggestionsScreen({ city, category, suggestions, onAdd,
         setResults(null);
         setSelected(new Set());
         setLastSortBy(sortBy);
+        setCursor(null);
         setSearchStatus(t.searchingMaps);
 
         try {
@@ -38,7 +66,7 @@ export default function SuggestionsScreen({ city, category, suggestions, onAdd,
             // Point to the new FastAPI backend endpoint if in local dev, or relative path if deployed
             // We strip any trailing slash from the env variable to avoid double slashes like '//api/scrape'
             const baseUrl = import.meta.env.VITE_API_BASE_URL?.replace(/\/+$/, '');
-            const apiUrl = baseUrl ? `${baseUrl}/api/scrape` : '/api/scrape';
+            const apiUrl = baseUrl ? `${baseUrl}/api/scrape/stream` : '/api/scrape/stream';
 
             const res = await fetch(apiUrl, {
                 method: 'POST',
@@ -47,6 +75,7 @@ export default function SuggestionsScreen({ city, category, suggestions, onAdd,
                     city,
                     category,
                     mood: moodModifier,
+                    sort: sortBy,
                     userLat: userLocation?.lat || null,
                     userLng: userLocation?.lng || null,
                 }),
@@ -55,7 +84,13 @@ export default function SuggestionsScreen({ city, category, suggestions, onAdd,
             let data;
             const contentType = res.headers.get("content-type");
 
-            if (contentType && contentType.indexOf("application/json") !== -1) {
+            if (res.ok && contentType && contentType.indexOf("application/x-ndjson") !== -1) {
+                // Show each card as soon as the backend extracts it
+                data = await readPlaceStream(res, (place) => {
+                    setResults(prev => [...(prev || []), place]);
+                    setIsSearching(false);
+                });
+            } else if (contentType && contentType.indexOf("application/json") !== -1) {
                 data = await res.json();
             } else {
                 const text = await res.text();
@@ -66,6 +101,7 @@ export default function SuggestionsScreen({ city, category, suggestions, onAdd,
                 throw new Error(data.error || data.details || `API error: ${res.status}`);
             }
 
+            setCursor(data.cursor || null);
             if (data.suggestions && data.suggestions.length > 0) {
                 setResults(data.suggestions);
                 setSeenNames(prev => [...prev, ...data.suggestions.map(s => s.name)]);
@@ -86,6 +122,35 @@ export default function SuggestionsScreen({ city, category, suggestions, onAdd,
         }
     };
 
+    // Continue the same search from where it stopped instead of scraping again
+    const loadMore = async () => {
+        if (!cursor) return;
+        setIsLoadingMore(true);
+        try {
+            const baseUrl = import.meta.env.VITE_API_BASE_URL?.replace(/\/+$/, '');
+            const apiUrl = baseUrl ? `${baseUrl}/api/scrape/more` : '/api/scrape/more';
+            const res = await fetch(apiUrl, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ cursor }),
+            });
+            const data = await res.json();
+            if (!res.ok) {
+                throw new Error(data.error || data.detail || `API error: ${res.status}`);
+            }
+            setCursor(data.cursor || null);
+            if (data.suggestions && data.suggestions.length > 0) {
+                setResults(prev => [...(prev || []), ...data.suggestions]);
+                setSeenNames(prev => [...prev, ...data.suggestions.map(s => s.name)]);
+            }
+        } catch (err) {
+            console.error('Load more failed:', err);
+            setCursor(null);
+        } finally {
+            setIsLoadingMore(false);
+        }
+    };
+
     const toggleSelect = (idx) => {
         setSelected(prev => {
             const next = new Set(prev);
@@ -116,6 +181,7 @@ export default function SuggestionsScreen({ city, category, suggestions, onAdd,
         setIsSearching(false);
         setSearchStatus('');
         setSeenNames([]);
+        setCursor(null);
     };
 
     return (
@@ -230,6 +296,11 @@ export default function SuggestionsScreen({ city, category, suggestions, onAdd,
                                             ? `${t.addToMix} (${selected.size})`
                                             : t.addToMix}
                                     </button>
+                                    {cursor && (
+                                        <button className="btn-secondary ai-retry-btn" onClick={loadMore} disabled={isLoadingMore}>
+                                            {isLoadingMore ? <Loader size={16} className="spin-icon" /> : <Plus size={16} />} {t.loadMore || 'أماكن أكثر'}
+                                        </button>
+                                    )}
                                     <button className="btn-secondary ai-retry-btn" onClick={() => smartSearch(lastSortBy)}>
                                         <Search size={16} /> {t.searchAgain || 'ابحث مره ثانية'}
                                     </button>
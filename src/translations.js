@@ -35,6 +35,7 @@ export const translations = {
         pickOne: "اختر أماكنك:",
         tryAgain: "جرب الطريقة الثانية",
         searchAgain: "ابحث مره ثانية",
+        loadMore: "أماكن أكثر",
         noSuggestions: "ما لقينا اقتراحات. جرب مرة ثانية.",
         googleSearch: "بحث خرائط قوقل",
         googleMapsSearch: "خرائط قوقل",
@@ -84,6 +85,7 @@ export const translations = {
         pickOne: "Select your picks:",
         tryAgain: "Try different sort",
         searchAgain: "Search again",
+        loadMore: "Load more",
         noSuggestions: "No suggestions found. Try again.",
         googleSearch: "Google Maps Search",
         googleMapsSearch: "Google Maps",
@@ -0,0 +1,67 @@
+import pytest
+
+from canonical import CollapseStats, canonicalize, normalize
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("  Coffee   Shops ", "coffee shops"),
+    ("Café", "cafe"),
+    ("أفضلُ  القهوةِ ـ ١٢", "افضل القهوه 12"),
+    ("Riyadh, Saudi Arabia!", "riyadh saudi arabia"),
+])
+def test_normalize(text, expected):
+    assert normalize(text) == expected
+
+
+@pytest.mark.parametrize("city, category, mood, city_id, category_id, mood_id, sort, query", [
+    # Known variants in either language collapse onto one id
+    ("Riyadh", "Coffee", "top rated", "riyadh", "cafe", "", "bayesian", "cafe"),
+    ("الرياض", "كافيهات", "الأفضل", "riyadh", "cafe", "", "bayesian", "cafe"),
+    ("riyadh, Saudi Arabia", "café", None, "riyadh", "cafe", "", None, "cafe"),
+    ("جدة", "القهوة", "الأقرب", "jeddah", "cafe", "", "distance", "cafe"),
+    ("Jeddah", "coffee shops", "closest", "jeddah", "cafe", "", "distance", "cafe"),
+    ("Riyadh", "Restaurants", "popular trending", "riyadh", "restaurant", "", "composite", "restaurant"),
+    ("Riyadh", "Cafe", "chill vibes", "riyadh", "cafe", "quiet", None, "quiet cafe"),
+    ("الرياض", "مطاعم", "جو هادي", "riyadh", "restaurant", "quiet", None, "quiet restaurant"),
+    # Categories that merely contain a synonym or sort word are searched as typed
+    ("Riyadh", "Hot Pot", "", "riyadh", "hot pot", "", None, "Hot Pot"),
+    ("Riyadh", "Top Golf", "", "riyadh", "top golf", "", None, "Top Golf"),
+    ("Riyadh", "Close Up Cafe", "", "riyadh", "close up cafe", "", None, "Close Up Cafe"),
+    ("Riyadh", "Best Buy", "closest", "riyadh", "best buy", "", "distance", "Best Buy"),
+    ("Riyadh", "sushi restaurant", "", "riyadh", "sushi restaurant", "", None, "sushi restaurant"),
+    ("Riyadh", "italian restaurant", "", "riyadh", "italian restaurant", "", None, "italian restaurant"),
+    ("Riyadh", "date night", "", "riyadh", "date night", "", None, "date night"),
+    # Unknown moods are kept, minus their sort words
+    ("Riyadh", "cafe", "date night", "riyadh", "cafe", "date night", None, "date night cafe"),
+    ("Riyadh", "sushi", "best late night", "riyadh", "sushi", "late_night", "bayesian", "late night sushi"),
+    # Unknown cities are searched as normalized text
+    ("Chicago, IL", "pizza", "", "chicago il", "pizza", "", None, "pizza"),
+    ("KSA", "cafe", "", "ksa", "cafe", "", None, "cafe"),
+])
+def test_canonicalize(city, category, mood, city_id, category_id, mood_id, sort, query):
+    q = canonicalize(city, category, mood)
+    assert (q.city, q.category, q.mood, q.sort, q.query) == (city_id, category_id, mood_id, sort, query)
+
+
+@pytest.mark.parametrize("city, category, mood", [
+    ("Riyadh", "Coffee", "chill vibes"),
+    ("جدة", "حلويات", "سهرة"),
+    ("Riyadh", "Hot Pot", "date night"),
+    ("Riyadh", "juice", "late night"),
+])
+def test_canonical_form_is_stable(city, category, mood):
+    q = canonicalize(city, category, mood)
+    again = canonicalize(q.city, q.category, q.mood)
+    assert (again.city, again.category, again.mood) == (q.city, q.category, q.mood)
+    # Unknown categories keep the user's casing in the search text only
+    assert normalize(again.query) == normalize(q.query)
+
+
+def test_collapse_ratio():
+    stats = CollapseStats()
+    for raw in [("Riyadh", "Coffee"), ("الرياض", "كافيهات"), ("riyadh", "café"), ("Riyadh", "pizza")]:
+        q = canonicalize(*raw)
+        stats.record(raw, (q.city, q.category))
+    assert stats.stats()["rawKeys"] == 4
+    assert stats.stats()["canonicalKeys"] == 2
+    assert stats.ratio() == 0.5
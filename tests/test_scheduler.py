@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from scheduler import QueueFull, ScrapeScheduler
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def started(workers, **kwargs):
+    scheduler = ScrapeScheduler(workers=workers, **kwargs)
+    await scheduler.start()
+    return scheduler
+
+
+def job(order, name, gate=None):
+    async def factory():
+        order.append(f"{name}:start")
+        if gate is not None:
+            await gate.wait()
+        order.append(f"{name}:end")
+        return name
+    return factory
+
+
+def test_clients_are_served_round_robin():
+    async def scenario():
+        scheduler = await started(1)
+        order, gate = [], asyncio.Event()
+        blocker = asyncio.create_task(scheduler.submit("x", job(order, "x0", gate)))
+        await asyncio.sleep(0)
+        jobs = [asyncio.create_task(scheduler.submit("a", job(order, f"a{i}"))) for i in range(3)]
+        jobs.append(asyncio.create_task(scheduler.submit("b", job(order, "b0"))))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(blocker, *jobs)
+        await scheduler.stop()
+        return [entry.split(":")[0] for entry in order if entry.endswith(":start")]
+
+    assert run(scenario()) == ["x0", "a0", "b0", "a1", "a2"]
+
+
+def test_per_client_limit():
+    async def scenario():
+        scheduler = await started(1, max_per_client=1)
+        gate = asyncio.Event()
+        running = asyncio.create_task(scheduler.submit("a", job([], "a0", gate)))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(scheduler.submit("a", job([], "a1")))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull) as rejected:
+            await scheduler.submit("a", job([], "a2"))
+        gate.set()
+        await asyncio.gather(running, queued)
+        await scheduler.stop()
+        return rejected.value
+
+    assert run(scenario()).per_client
+
+
+def test_single_worker_refuses_background_jobs():
+    async def scenario():
+        scheduler = await started(1)
+        with pytest.raises(QueueFull):
+            await scheduler.submit("_prefetch", job([], "bg"), low_priority=True)
+        await scheduler.stop()
+
+    run(scenario())
+
+
+def test_last_idle_worker_is_kept_for_live_jobs():
+    async def scenario():
+        scheduler = await started(2)
+        order, gate = [], asyncio.Event()
+        background = [
+            asyncio.create_task(scheduler.submit("_prefetch", job(order, f"bg{i}", gate), low_priority=True))
+            for i in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        live = asyncio.create_task(scheduler.submit("a", job(order, "live")))
+        await asyncio.sleep(0.01)
+        # The live job ran while the first background job still held its worker
+        assert order == ["bg0:start", "live:start", "live:end"]
+        gate.set()
+        await asyncio.gather(live, *background)
+        await scheduler.stop()
+        return order
+
+    assert run(scenario())[-2:] == ["bg1:start", "bg1:end"]